@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+"""Benchmarks for godot_parser"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import timeit
+
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import godot_parser
+print(time.perf_counter() - start)
+"""
+
+TYPECHECK_SCRIPT = """
+import json
+import timeit
+
+from godot_parser import GDScene, GDSection, GDSectionHeader, Node, Vector2
+
+section = GDSection(GDSectionHeader("node", name="A"), position=Vector2(1, 2))
+node = Node("A", properties={"visible": False})
+scene = GDScene()
+with scene.use_tree() as tree:
+    tree.root = Node("Root", type="Node2D")
+    for i in range(100):
+        tree.root.add_child(Node("Child" + str(i), type="Sprite", properties={"x": i}))
+
+
+def flatten():
+    with scene.use_tree():
+        pass
+
+
+cases = [
+    ("GDSection.__getitem__", lambda: section["position"]),
+    ("Node.get", lambda: node.get("visible")),
+    ("Vector2()", lambda: Vector2(1, 2)),
+    ("use_tree() with 100 nodes", flatten),
+]
+results = {}
+for name, func in cases:
+    number, _ = timeit.Timer(func).autorange()
+    results[name] = min(timeit.repeat(func, number=number, repeat=%d)) / number
+print(json.dumps(results))
+"""
+
+
+def bench_import(args) -> bool:
+    """Time `import godot_parser` in fresh interpreters"""
+    times = []
+    for _ in range(args.runs):
+        output = subprocess.check_output([sys.executable, "-c", IMPORT_SCRIPT])
+        times.append(float(output) * 1000)
+    median = statistics.median(times)
+    print(
+        "import godot_parser: min %.1fms, median %.1fms (budget %.1fms)"
+        % (min(times), median, args.budget)
+    )
+    return median <= args.budget
+
+
+def bench_typecheck(args) -> bool:
+    """Compare the per-call cost of hot paths with and without type checking"""
+    results = {}
+    for mode, value in (("production", "0"), ("typecheck", "1")):
+        env = dict(os.environ, GODOT_PARSER_TYPECHECK=value)
+        output = subprocess.check_output(
+            [sys.executable, "-c", TYPECHECK_SCRIPT % args.repeat], env=env
+        )
+        results[mode] = json.loads(output)
+    print("%-28s %14s %14s %8s" % ("", "production", "typecheck", "ratio"))
+    for name, production in results["production"].items():
+        typecheck = results["typecheck"][name]
+        print(
+            "%-28s %12.2fus %12.2fus %7.1fx"
+            % (name, production * 1e6, typecheck * 1e6, typecheck / production)
+        )
+    return True
+
+
+def reference_stringify(value) -> str:
+    """The serializer from godot_parser 0.1.7, which stringify_object must match"""
+    # pylint: disable=import-outside-toplevel
+    from godot_parser import GDObject, PackedArray
+
+    if value is None:
+        return "null"
+    elif isinstance(value, str):
+        return json.dumps(value)
+    elif isinstance(value, bool):
+        return "true" if value else "false"
+    elif isinstance(value, dict):
+        return (
+            "{\n"
+            + ",\n".join(
+                ['"%s": %s' % (k, reference_stringify(v)) for k, v in value.items()]
+            )
+            + "\n}"
+        )
+    elif isinstance(value, list):
+        return "[ " + ", ".join([reference_stringify(v) for v in value]) + " ]"
+    elif isinstance(value, PackedArray) and value.typecode == "d":
+        text = [repr(v) for v in value.values]
+        text = [t[:-2] if t.endswith(".0") else t for t in text]
+        return "%s( %s )" % (value.name, ", ".join(text))
+    elif type(value).__str__ is GDObject.__str__:
+        return "%s( %s )" % (
+            value.name,
+            ", ".join([reference_stringify(v) for v in value.args]),
+        )
+    else:
+        return str(value)
+
+
+def reference_serialize(file) -> str:
+    """Serialize a file with reference_stringify"""
+    # pylint: disable=import-outside-toplevel
+    from godot_parser import GDSection
+
+    sections = []
+    for section in file.get_sections():
+        header = "[" + section.header.name
+        for k, v in section.header.attributes.items():
+            header += " %s=%s" % (k, reference_stringify(v))
+        lines = [header + "]"]
+        for k, v in section.properties.items():
+            if isinstance(v, tuple):
+                lines.append("%s = %s" % (k, GDSection.format_value(v)))
+            else:
+                lines.append("%s = %s" % (k, reference_stringify(v)))
+        sections.append("\n".join(lines))
+    return "\n\n".join(sections) + "\n"
+
+
+def random_scene(nodes: int):
+    """Build a scene that uses every kind of value"""
+    # pylint: disable=import-outside-toplevel
+    from godot_parser import (
+        Color,
+        ExtResource,
+        GDObject,
+        GDScene,
+        NodePath,
+        PackedVector2Array,
+        PoolIntArray,
+        SubResource,
+        Vector2,
+    )
+
+    rand = random.Random(0)
+    strings = ["", "plain", 'say "hi"', "back\\slash", "tab\tnew\nline", "héllo ☃"]
+
+    def number():
+        return rand.choice([rand.randint(-1000, 1000), rand.uniform(-100, 100), 1.0])
+
+    def value(depth=0):
+        kind = rand.randint(0, 9 if depth < 2 else 5)
+        if kind == 0:
+            return number()
+        elif kind == 1:
+            return rand.choice([True, False, None])
+        elif kind == 2:
+            return rand.choice(strings)
+        elif kind == 3:
+            return rand.choice(
+                [
+                    Vector2(number(), number()),
+                    Color(rand.random(), rand.random(), rand.random(), 1),
+                    ExtResource(rand.randint(1, 10)),
+                    SubResource(rand.randint(1, 10)),
+                    NodePath(rand.choice(strings[:2]) + "/Child"),
+                ]
+            )
+        elif kind == 4:
+            return PackedVector2Array(*[number() for _ in range(rand.randint(0, 20))])
+        elif kind == 5:
+            return PoolIntArray(*[rand.randint(-99, 99) for _ in range(20)])
+        elif kind == 6:
+            return [value(depth + 1) for _ in range(rand.randint(0, 4))]
+        elif kind == 7:
+            return {"k%d" % i: value(depth + 1) for i in range(rand.randint(0, 3))}
+        elif kind == 8:
+            return ("Array[int]", [rand.randint(0, 9) for _ in range(5)])
+        return GDObject("Transform2D", 1, 0, 0, 1, number(), number())
+
+    scene = GDScene()
+    for i in range(10):
+        scene.add_ext_resource("res://Texture%d.png" % i, "Texture")
+    for i in range(nodes):
+        node = scene.add_node(
+            "Node%d" % i, "Node2D", parent=None if i == 0 else ".", groups=["a"]
+        )
+        for j in range(rand.randint(0, 8)):
+            node["property%d" % j] = value()
+    return scene
+
+
+def bench_serialize(args) -> bool:
+    """Check that files serialize exactly like 0.1.7, and compare the speed"""
+    # pylint: disable=import-outside-toplevel
+    from godot_parser import GDFile
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    files = {"random scene": random_scene(args.nodes)}
+    for path in glob.glob(os.path.join(here, "tests", "example_scenes", "*.tscn")):
+        file = GDFile.load(path, engine="fast")
+        for section in file.get_sections():
+            # Write every section instead of its original text
+            section.source = None
+        files[os.path.basename(path)] = file
+    identical = True
+    print("%-40s %12s %12s %8s" % ("", "reference", "current", "speedup"))
+    for name, file in files.items():
+        if str(file) != reference_serialize(file):
+            print("%s: output differs from the reference" % name)
+            identical = False
+            continue
+        times = []
+        for func in (reference_serialize, str):
+            timer = timeit.Timer(lambda: func(file))  # pylint: disable=W0640
+            number, _ = timer.autorange()
+            times.append(min(timer.repeat(number=number, repeat=args.repeat)) / number)
+        print(
+            "%-40s %10.2fms %10.2fms %7.2fx"
+            % (name, times[0] * 1e3, times[1] * 1e3, times[0] / times[1])
+        )
+    return identical
+
+
+def main():
+    """Run a benchmark and exit with an error if it is over budget"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    import_parser = subparsers.add_parser("import", help=bench_import.__doc__)
+    import_parser.add_argument("--runs", type=int, default=10)
+    import_parser.add_argument(
+        "--budget", type=float, default=100, help="Budget for the median, in ms"
+    )
+    import_parser.set_defaults(func=bench_import)
+    typecheck_parser = subparsers.add_parser("typecheck", help=bench_typecheck.__doc__)
+    typecheck_parser.add_argument("--repeat", type=int, default=5)
+    typecheck_parser.set_defaults(func=bench_typecheck)
+    serialize_parser = subparsers.add_parser("serialize", help=bench_serialize.__doc__)
+    serialize_parser.add_argument("--nodes", type=int, default=2000)
+    serialize_parser.add_argument("--repeat", type=int, default=5)
+    serialize_parser.set_defaults(func=bench_serialize)
+    args = parser.parse_args()
+    if not args.func(args):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,53 @@
+import importlib
+import os
+
+# Type checking every call with beartype is slow, so it is only enabled in debug mode.
+# It has to happen before the submodules are imported.
+TYPECHECK = os.environ.get("GODOT_PARSER_TYPECHECK", "").lower() in ("1", "true", "yes")
+if TYPECHECK:
+    from beartype import BeartypeConf
+    from beartype.claw import beartype_this_package
+
+    # Wrapping pyparsing's parse actions breaks them
+    beartype_this_package(
+        conf=BeartypeConf(
+            is_pep484_tower=True,
+            claw_skip_package_names=(
+                "godot_parser.structure",
+                "godot_parser.values",
+            ),
+        )
+    )
+
+from .cache import *
 from .files import *
 from .objects import *
+from .parser import *
+from .query import *
 from .sections import *
 from .tree import *
-from beartype.claw import beartype_this_package
-
-beartype_this_package()
 
 __version__ = "0.1.7"
 
 parse = GDFile.parse
 
 load = GDFile.load
+
+# These modules are slow to import and rarely needed, so they are only imported when
+# one of their names is first used
+_LAZY_NAMES = {
+    "aload": "aio",
+    "aload_many": "aio",
+    "awrite": "aio",
+    "GodotBinaryException": "binary",
+    "is_binary": "binary",
+    "parse_binary": "binary",
+    "serialize_binary": "binary",
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_NAMES:
+        module = importlib.import_module("." + _LAZY_NAMES[name], __name__)
+        return getattr(module, name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
@@ -0,0 +1,55 @@
+""" Versions of load and write for asyncio """
+import asyncio
+import functools
+from concurrent.futures import Executor
+from typing import Any, Iterable, List, Optional
+
+from .files import GDFile
+
+__all__ = ["aload", "aload_many", "awrite"]
+
+
+async def aload(
+    filepath: str, executor: Optional[Executor] = None, **kwargs: Any
+) -> GDFile:
+    """
+    Load a Godot file without blocking the event loop (see GDFile.load)
+
+    The file is read and parsed in the executor, or in the event loop's default
+    thread pool. Parsing holds the GIL, so pass a ProcessPoolExecutor to keep large
+    files from slowing down the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, functools.partial(GDFile.load, filepath, **kwargs)
+    )
+
+
+async def aload_many(
+    filepaths: Iterable[str],
+    executor: Optional[Executor] = None,
+    limit: int = 8,
+    **kwargs: Any
+) -> List[GDFile]:
+    """Load files concurrently with aload, at most limit at a time, in order"""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def load_one(filepath: str) -> GDFile:
+        async with semaphore:
+            return await aload(filepath, executor, **kwargs)
+
+    return list(await asyncio.gather(*[load_one(path) for path in filepaths]))
+
+
+async def awrite(
+    file: GDFile, filename: str, executor: Optional[Executor] = None, **kwargs: Any
+) -> bool:
+    """
+    Write a Godot file without blocking the event loop (see GDFile.write)
+
+    The file must not be modified until this returns.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, functools.partial(file.write, filename, **kwargs)
+    )
@@ -0,0 +1,690 @@
+""" Reader and writer for Godot's binary resource format (.res/.scn files)
+
+The binary format stores the same resources as the text format. Files are read into
+the same sections as the text parser produces: a [gd_resource] header, one
+[ext_resource] per external resource, one [sub_resource] per internal resource and a
+final [resource] section for the main resource. Binary scenes are PackedScene
+resources, so they are read as a [gd_resource type="PackedScene"] with the scene
+stored in its _bundled property, exactly as Godot would save them as a .tres file.
+
+Both the Godot 3 and the Godot 4 layouts can be read. Files are written in the Godot
+3 layout, or in the Godot 4 layout if the header has format=3 like Godot 4 text files.
+Compressed (RSCC) files are not supported.
+"""
+
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Sequence, Tuple
+
+from .objects import GD_OBJECT_REGISTRY, ExtResource, GDObject, NodePath, SubResource
+from .sections import (
+    GDExtResourceSection,
+    GDResourceSection,
+    GDSection,
+    GDSectionHeader,
+    GDSubResourceSection,
+)
+
+__all__ = ["GodotBinaryException", "is_binary", "parse_binary", "serialize_binary"]
+
+MAGIC = b"RSRC"
+COMPRESSED_MAGIC = b"RSCC"
+
+# Header flags used by Godot 4
+FLAG_NAMED_SCENE_IDS = 1
+FLAG_UIDS = 2
+FLAG_REAL_T_IS_DOUBLE = 4
+FLAG_HAS_SCRIPT_CLASS = 8
+
+# Variant type ids. The names follow Godot's resource_format_binary.cpp
+VARIANT_NIL = 1
+VARIANT_BOOL = 2
+VARIANT_INT = 3
+VARIANT_FLOAT = 4
+VARIANT_STRING = 5
+VARIANT_VECTOR2 = 10
+VARIANT_RECT2 = 11
+VARIANT_VECTOR3 = 12
+VARIANT_PLANE = 13
+VARIANT_QUATERNION = 14
+VARIANT_AABB = 15
+VARIANT_BASIS = 16
+VARIANT_TRANSFORM3D = 17
+VARIANT_TRANSFORM2D = 18
+VARIANT_COLOR = 20
+VARIANT_NODE_PATH = 22
+VARIANT_RID = 23
+VARIANT_OBJECT = 24
+VARIANT_INPUT_EVENT = 25
+VARIANT_DICTIONARY = 26
+VARIANT_ARRAY = 30
+VARIANT_RAW_ARRAY = 31
+VARIANT_INT32_ARRAY = 32
+VARIANT_FLOAT32_ARRAY = 33
+VARIANT_STRING_ARRAY = 34
+VARIANT_VECTOR3_ARRAY = 35
+VARIANT_COLOR_ARRAY = 36
+VARIANT_VECTOR2_ARRAY = 37
+VARIANT_INT64 = 40
+VARIANT_DOUBLE = 41
+VARIANT_STRING_NAME = 44
+VARIANT_VECTOR2I = 45
+VARIANT_RECT2I = 46
+VARIANT_VECTOR3I = 47
+VARIANT_INT64_ARRAY = 48
+VARIANT_FLOAT64_ARRAY = 49
+VARIANT_VECTOR4 = 50
+VARIANT_VECTOR4I = 51
+VARIANT_PROJECTION = 52
+VARIANT_VECTOR4_ARRAY = 53
+
+OBJECT_EMPTY = 0
+OBJECT_EXTERNAL_RESOURCE = 1
+OBJECT_INTERNAL_RESOURCE = 2
+OBJECT_EXTERNAL_RESOURCE_INDEX = 3
+
+# Fixed-size math types: variant id -> (Godot 3 name, Godot 4 name, count, kind),
+# where kind is "real" (float or double depending on the file), "int" or "color"
+# (always float in Godot 4)
+_MATH_TYPES: Dict[int, Tuple[str, str, int, str]] = {
+    VARIANT_VECTOR2: ("Vector2", "Vector2", 2, "real"),
+    VARIANT_RECT2: ("Rect2", "Rect2", 4, "real"),
+    VARIANT_VECTOR3: ("Vector3", "Vector3", 3, "real"),
+    VARIANT_PLANE: ("Plane", "Plane", 4, "real"),
+    VARIANT_QUATERNION: ("Quat", "Quaternion", 4, "real"),
+    VARIANT_AABB: ("AABB", "AABB", 6, "real"),
+    VARIANT_BASIS: ("Basis", "Basis", 9, "real"),
+    VARIANT_TRANSFORM3D: ("Transform", "Transform3D", 12, "real"),
+    VARIANT_TRANSFORM2D: ("Transform2D", "Transform2D", 6, "real"),
+    VARIANT_COLOR: ("Color", "Color", 4, "color"),
+    VARIANT_VECTOR2I: ("Vector2i", "Vector2i", 2, "int"),
+    VARIANT_RECT2I: ("Rect2i", "Rect2i", 4, "int"),
+    VARIANT_VECTOR3I: ("Vector3i", "Vector3i", 3, "int"),
+    VARIANT_VECTOR4: ("Vector4", "Vector4", 4, "real"),
+    VARIANT_VECTOR4I: ("Vector4i", "Vector4i", 4, "int"),
+    VARIANT_PROJECTION: ("Projection", "Projection", 16, "real"),
+}
+
+# Packed arrays: variant id -> (Godot 3 name, Godot 4 name, kind)
+_ARRAY_TYPES: Dict[int, Tuple[str, str, str]] = {
+    VARIANT_RAW_ARRAY: ("PoolByteArray", "PackedByteArray", "byte"),
+    VARIANT_INT32_ARRAY: ("PoolIntArray", "PackedInt32Array", "int"),
+    VARIANT_FLOAT32_ARRAY: ("PoolRealArray", "PackedFloat32Array", "real"),
+    VARIANT_STRING_ARRAY: ("PoolStringArray", "PackedStringArray", "string"),
+    VARIANT_VECTOR2_ARRAY: ("PoolVector2Array", "PackedVector2Array", "real"),
+    VARIANT_VECTOR3_ARRAY: ("PoolVector3Array", "PackedVector3Array", "real"),
+    VARIANT_COLOR_ARRAY: ("PoolColorArray", "PackedColorArray", "color"),
+    VARIANT_INT64_ARRAY: ("PackedInt64Array", "PackedInt64Array", "int64"),
+    VARIANT_FLOAT64_ARRAY: ("PackedFloat64Array", "PackedFloat64Array", "double"),
+    VARIANT_VECTOR4_ARRAY: ("PackedVector4Array", "PackedVector4Array", "real"),
+}
+
+# Name of a GDObject -> variant id, for writing
+_NAME_TO_VARIANT: Dict[str, int] = {}
+for _variant, (_name3, _name4, *_) in list(_MATH_TYPES.items()) + list(
+    _ARRAY_TYPES.items()
+):
+    _NAME_TO_VARIANT[_name3] = _variant
+    _NAME_TO_VARIANT[_name4] = _variant
+
+_ARRAY_WIDTHS = {
+    VARIANT_VECTOR2_ARRAY: 2,
+    VARIANT_VECTOR3_ARRAY: 3,
+    VARIANT_COLOR_ARRAY: 4,
+    VARIANT_VECTOR4_ARRAY: 4,
+}
+
+# Godot encodes resource uids in base 34 with these characters
+_UID_CHARS = "abcdefghijklmnopqrstuvwxy012345678"
+_INVALID_UID = 0xFFFFFFFFFFFFFFFF
+
+
+class GodotBinaryException(Exception):
+    """Thrown when a binary resource is malformed or uses unsupported features"""
+
+
+def is_binary(data: bytes) -> bool:
+    """Check the magic bytes at the start of a file for the binary format"""
+    return data[:4] in (MAGIC, COMPRESSED_MAGIC)
+
+
+def _shortest_float32(value: float) -> float:
+    """Round a float32 to the shortest decimal that converts back to the same float32"""
+    packed = struct.pack("<f", value)
+    for precision in (6, 7, 8):
+        candidate = float("%.*g" % (precision, value))
+        if struct.pack("<f", candidate) == packed:
+            return candidate
+    return value
+
+
+def _shortest_float32_array(values: array) -> array:
+    """Round an array of float32 like _shortest_float32, into an array of doubles"""
+    # Usually 6 significant digits are enough, so only fix up the other values
+    rounded = array("d", map(float, map("%.6g".__mod__, values)))
+    check = array("f", rounded)
+    if check != values:
+        for i, value in enumerate(values):
+            if check[i] != value:
+                rounded[i] = _shortest_float32(value)
+    return rounded
+
+
+def uid_to_text(uid: int) -> str:
+    """Convert a resource uid to the uid://... form used in text files"""
+    chars = []
+    while True:
+        chars.append(_UID_CHARS[uid % len(_UID_CHARS)])
+        uid //= len(_UID_CHARS)
+        if not uid:
+            break
+    return "uid://" + "".join(reversed(chars))
+
+
+def text_to_uid(text: str) -> int:
+    """Convert a uid://... string back to the numeric resource uid"""
+    if not text.startswith("uid://"):
+        raise GodotBinaryException("Invalid resource uid '%s'" % text)
+    uid = 0
+    for char in text[6:]:
+        index = _UID_CHARS.find(char)
+        if index < 0:
+            raise GodotBinaryException("Invalid resource uid '%s'" % text)
+        uid = uid * len(_UID_CHARS) + index
+    return uid
+
+
+class _Reader(object):
+    """Reads values from the binary format starting at a position"""
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.pos = 0
+        self.endian = "<"
+        self.real = "f"
+        self.godot4 = False
+        self.strings: List[str] = []
+        self.named_scene_ids = False
+        # Internal resource index (or subindex in Godot 3) -> sub_resource id
+        self.internal_ids: Dict[int, int] = {}
+
+    def unpack(self, fmt: str) -> tuple:
+        size = struct.calcsize(self.endian + fmt)
+        if self.pos + size > len(self.data):
+            raise GodotBinaryException(
+                "Unexpected end of data at byte %d" % len(self.data)
+            )
+        values = struct.unpack_from(self.endian + fmt, self.data, self.pos)
+        self.pos += size
+        return values
+
+    def u32(self) -> int:
+        return self.unpack("I")[0]
+
+    def u64(self) -> int:
+        return self.unpack("Q")[0]
+
+    def raw(self, size: int) -> bytes:
+        if self.pos + size > len(self.data):
+            raise GodotBinaryException(
+                "Unexpected end of data at byte %d" % len(self.data)
+            )
+        value = self.data[self.pos : self.pos + size]
+        self.pos += size
+        return value
+
+    def string(self) -> str:
+        """Read a length-prefixed, null-terminated UTF-8 string"""
+        length = self.u32()
+        return self.raw(length).rstrip(b"\0").decode("utf-8")
+
+    def string_at(self, index: int) -> str:
+        try:
+            return self.strings[index]
+        except IndexError:
+            raise GodotBinaryException(  # pylint: disable=W0707
+                "Invalid string index %d" % index
+            )
+
+    def string_ref(self) -> str:
+        """Read an index into the string table, or an inline string"""
+        index = self.u32()
+        if index & 0x80000000:
+            length = index & 0x7FFFFFFF
+            return self.raw(length).rstrip(b"\0").decode("utf-8")
+        return self.string_at(index)
+
+    def reals(self, count: int, kind: str) -> List[Any]:
+        if kind == "int":
+            return list(self.unpack("%di" % count))
+        real = "f" if kind == "color" and self.godot4 else self.real
+        values = self.unpack("%d%s" % (count, real))
+        if real == "f":
+            values = tuple(map(_shortest_float32, values))
+        # The text format writes whole components without a decimal point
+        return [int(v) if v.is_integer() else v for v in values]
+
+    def variant(self) -> Any:
+        variant = self.u32()
+        if variant == VARIANT_NIL:
+            return None
+        elif variant == VARIANT_BOOL:
+            return bool(self.u32())
+        elif variant == VARIANT_INT:
+            return self.unpack("i")[0]
+        elif variant == VARIANT_INT64:
+            return self.unpack("q")[0]
+        elif variant == VARIANT_FLOAT:
+            value = self.unpack(self.real)[0]
+            return _shortest_float32(value) if self.real == "f" else value
+        elif variant == VARIANT_DOUBLE:
+            return self.unpack("d")[0]
+        elif variant in (VARIANT_STRING, VARIANT_STRING_NAME):
+            return self.string()
+        elif variant in _MATH_TYPES:
+            name3, name4, count, kind = _MATH_TYPES[variant]
+            return GDObject.from_parser(
+                [name4 if self.godot4 else name3] + self.reals(count, kind)
+            )
+        elif variant == VARIANT_NODE_PATH:
+            return self.node_path()
+        elif variant == VARIANT_OBJECT:
+            return self.object()
+        elif variant == VARIANT_DICTIONARY:
+            length = self.u32() & 0x7FFFFFFF
+            result = {}
+            for _ in range(length):
+                key = self.variant()
+                try:
+                    result[key] = self.variant()
+                except TypeError:
+                    raise GodotBinaryException(  # pylint: disable=W0707
+                        "Unsupported dictionary key %r" % (key,)
+                    )
+            return result
+        elif variant == VARIANT_ARRAY:
+            length = self.u32() & 0x7FFFFFFF
+            return [self.variant() for _ in range(length)]
+        elif variant in _ARRAY_TYPES:
+            return self.packed_array(variant)
+        raise GodotBinaryException(
+            "Unsupported variant type %d at byte %d" % (variant, self.pos - 4)
+        )
+
+    def node_path(self) -> NodePath:
+        name_count, subname_count = self.unpack("HH")
+        absolute = bool(subname_count & 0x8000)
+        names = [self.string_ref() for _ in range(name_count)]
+        subnames = [self.string_ref() for _ in range(subname_count & 0x7FFF)]
+        path = ("/" if absolute else "") + "/".join(names)
+        if subnames:
+            path += ":" + ":".join(subnames)
+        return NodePath(path)
+
+    def object(self) -> Any:
+        kind = self.u32()
+        if kind == OBJECT_EMPTY:
+            return None
+        elif kind == OBJECT_EXTERNAL_RESOURCE_INDEX:
+            return ExtResource(self.u32() + 1)
+        elif kind == OBJECT_INTERNAL_RESOURCE:
+            index = self.u32()
+            if index not in self.internal_ids:
+                raise GodotBinaryException("Invalid internal resource %d" % index)
+            return SubResource(self.internal_ids[index])
+        raise GodotBinaryException("Unsupported object reference type %d" % kind)
+
+    def packed_array(self, variant: int) -> Any:
+        name3, name4, kind = _ARRAY_TYPES[variant]
+        name = name4 if self.godot4 else name3
+        length = self.u32() * _ARRAY_WIDTHS.get(variant, 1)
+        if kind == "string":
+            return GDObject(name, *[self.string() for _ in range(length)])
+        factory = GD_OBJECT_REGISTRY[name]
+        if kind == "byte":
+            values = array("B", self.raw(length))
+            # Byte arrays are padded to a multiple of 4 bytes
+            self.raw(-length % 4)
+            return factory.from_array(values)
+        typecode = {"int": "i", "int64": "q", "double": "d"}.get(kind)
+        if typecode is None:
+            typecode = "f" if kind == "color" and self.godot4 else self.real
+        values = array(typecode)
+        values.frombytes(self.raw(length * values.itemsize))
+        if (self.endian == ">") == (sys.byteorder == "little"):
+            values.byteswap()
+        if typecode == "f":
+            values = _shortest_float32_array(values)
+        elif typecode != factory.typecode:
+            values = array(factory.typecode, values)
+        return factory.from_array(values)
+
+
+def parse_binary(data: bytes) -> List[GDSection]:
+    """Parse a binary resource into the same sections as the equivalent text file"""
+    if data[:4] == COMPRESSED_MAGIC:
+        raise NotImplementedError("Compressed binary resources are not supported")
+    if data[:4] != MAGIC:
+        raise GodotBinaryException("Not a binary resource")
+    reader = _Reader(data)
+    reader.pos = 4
+    if reader.u32():
+        reader.endian = ">"
+    use_real64 = reader.u32()
+    major, _, format_version = reader.unpack("III")
+    reader.godot4 = major >= 4
+    resource_type = reader.string()
+    reader.u64()  # Offset of the import metadata
+    header = GDSectionHeader("gd_resource", type=resource_type)
+    if reader.godot4:
+        flags = reader.u32()
+        reader.named_scene_ids = bool(flags & FLAG_NAMED_SCENE_IDS)
+        use_real64 = use_real64 or flags & FLAG_REAL_T_IS_DOUBLE
+        uid = reader.u64()
+        if flags & FLAG_HAS_SCRIPT_CLASS:
+            header["script_class"] = reader.string()
+        reader.unpack("11I")
+    else:
+        flags = uid = 0
+        reader.unpack("14I")
+    if use_real64:
+        reader.real = "d"
+
+    reader.strings = [reader.string() for _ in range(reader.u32())]
+    externals = []
+    for _ in range(reader.u32()):
+        ext_type = reader.string()
+        path = reader.string()
+        ext_uid = reader.u64() if flags & FLAG_UIDS else _INVALID_UID
+        externals.append((ext_type, path, ext_uid))
+    internals = [(reader.string(), reader.u64()) for _ in range(reader.u32())]
+    if not internals:
+        raise GodotBinaryException("Binary resource has no main resource")
+
+    header["load_steps"] = len(externals) + len(internals)
+    header["format"] = 3 if reader.godot4 else 2
+    if flags & FLAG_UIDS and uid != _INVALID_UID:
+        header["uid"] = uid_to_text(uid)
+    sections = [GDSection(header)]
+    for i, (ext_type, path, ext_uid) in enumerate(externals):
+        if ext_uid != _INVALID_UID:
+            sections.append(
+                GDSection(
+                    GDSectionHeader(
+                        "ext_resource",
+                        type=ext_type,
+                        uid=uid_to_text(ext_uid),
+                        path=path,
+                        id=i + 1,
+                    )
+                )
+            )
+        else:
+            sections.append(GDExtResourceSection(path, ext_type, i + 1))
+
+    # Godot 3 refers to sub-resources by the number in their local:// path, Godot 4
+    # by their index. Either way they get integer ids like in text files.
+    sub_ids = []
+    for i, (path, _) in enumerate(internals[:-1]):
+        if reader.named_scene_ids:
+            sub_ids.append(i + 1)
+            reader.internal_ids[i] = i + 1
+            continue
+        try:
+            subindex = int(path[len("local://") :])
+        except ValueError:
+            raise GodotBinaryException(  # pylint: disable=W0707
+                "Invalid internal resource path '%s'" % path
+            )
+        sub_ids.append(subindex)
+        reader.internal_ids[subindex] = subindex
+
+    for i, (_, offset) in enumerate(internals):
+        reader.pos = offset
+        res_type = reader.string()
+        if i < len(sub_ids):
+            section: GDSection = GDSubResourceSection(res_type, sub_ids[i])
+        else:
+            section = GDResourceSection()
+        for _ in range(reader.u32()):
+            name = reader.string_at(reader.u32())
+            section[name] = reader.variant()
+        sections.append(section)
+    return sections
+
+
+class _Writer(object):
+    """Encodes values in the binary format and collects the string table"""
+
+    def __init__(self, godot4: bool, real64: bool = False) -> None:
+        self.godot4 = godot4
+        self.real = "d" if real64 else "f"
+        self.buffer = bytearray()
+        self.strings: Dict[str, int] = {}
+        # ExtResource/SubResource id -> index written in object references
+        self.external_indexes: Dict[Any, int] = {}
+        self.internal_indexes: Dict[Any, int] = {}
+
+    def pack(self, fmt: str, *values: Any) -> None:
+        self.buffer += struct.pack("<" + fmt, *values)
+
+    def string(self, value: str) -> None:
+        data = value.encode("utf-8") + b"\0"
+        self.pack("I", len(data))
+        self.buffer += data
+
+    def string_index(self, value: str) -> int:
+        return self.strings.setdefault(value, len(self.strings))
+
+    def values(self, typecode: str, values: Sequence[Any]) -> None:
+        data = array(typecode, values)
+        if sys.byteorder != "little":
+            data.byteswap()
+        self.buffer += data.tobytes()
+
+    def variant(self, value: Any) -> None:
+        if value is None:
+            self.pack("I", VARIANT_NIL)
+        elif isinstance(value, bool):
+            self.pack("II", VARIANT_BOOL, value)
+        elif isinstance(value, int):
+            if -(2**31) <= value < 2**31:
+                self.pack("Ii", VARIANT_INT, value)
+            else:
+                self.pack("Iq", VARIANT_INT64, value)
+        elif isinstance(value, float):
+            if self.real == "d" or _fits_float32(value):
+                self.pack("I" + self.real, VARIANT_FLOAT, value)
+            else:
+                self.pack("Id", VARIANT_DOUBLE, value)
+        elif isinstance(value, str):
+            self.pack("I", VARIANT_STRING)
+            self.string(value)
+        elif isinstance(value, dict):
+            self.pack("II", VARIANT_DICTIONARY, len(value))
+            for k, v in value.items():
+                self.variant(k)
+                self.variant(v)
+        elif isinstance(value, (list, tuple)):
+            if isinstance(value, tuple):
+                # Typed arrays like ('Array[int]', [1, 5, 3]) are written untyped
+                value = value[1]
+            self.pack("II", VARIANT_ARRAY, len(value))
+            for v in value:
+                self.variant(v)
+        elif isinstance(value, ExtResource):
+            self.pack("I", VARIANT_OBJECT)
+            self.object(OBJECT_EXTERNAL_RESOURCE_INDEX, self.external_indexes, value)
+        elif isinstance(value, SubResource):
+            self.pack("I", VARIANT_OBJECT)
+            self.object(OBJECT_INTERNAL_RESOURCE, self.internal_indexes, value)
+        elif isinstance(value, GDObject) and value.name == "NodePath":
+            self.node_path(value.args[0])
+        elif isinstance(value, GDObject) and value.name in _NAME_TO_VARIANT:
+            variant = _NAME_TO_VARIANT[value.name]
+            self.pack("I", variant)
+            if variant in _MATH_TYPES:
+                self.math_type(variant, value)
+            else:
+                self.packed_array(variant, value)
+        else:
+            raise GodotBinaryException(
+                "Cannot write %s in the binary format" % (value,)
+            )
+
+    def object(self, kind: int, indexes: Dict[Any, int], value: GDObject) -> None:
+        try:
+            index = indexes[value.id]  # type: ignore
+        except KeyError:
+            raise GodotBinaryException(  # pylint: disable=W0707
+                "%s refers to a missing section" % value
+            )
+        self.pack("II", kind, index)
+
+    def node_path(self, path: str) -> None:
+        names, _, subnames = path.partition(":")
+        name_list = [name for name in names.split("/") if name]
+        subname_list = subnames.split(":") if subnames else []
+        absolute = 0x8000 if path.startswith("/") else 0
+        self.pack(
+            "IHH", VARIANT_NODE_PATH, len(name_list), len(subname_list) | absolute
+        )
+        for name in name_list + subname_list:
+            self.pack("I", self.string_index(name))
+
+    def math_type(self, variant: int, value: GDObject) -> None:
+        _, _, count, kind = _MATH_TYPES[variant]
+        if len(value.args) != count:
+            raise GodotBinaryException(
+                "%s must have %d components" % (value.name, count)
+            )
+        if kind == "int":
+            real = "i"
+        else:
+            real = "f" if kind == "color" and self.godot4 else self.real
+        self.pack("%d%s" % (count, real), *value.args)
+
+    def packed_array(self, variant: int, value: GDObject) -> None:
+        _, _, kind = _ARRAY_TYPES[variant]
+        values = value.args
+        self.pack("I", len(values) // _ARRAY_WIDTHS.get(variant, 1))
+        if kind == "string":
+            for v in values:
+                self.string(v)
+        elif kind == "byte":
+            self.buffer += bytes(values)
+            self.buffer += bytes(-len(values) % 4)
+        else:
+            typecode = {"int": "i", "int64": "q", "double": "d"}.get(kind)
+            if typecode is None:
+                typecode = "f" if kind == "color" and self.godot4 else self.real
+            self.values(typecode, values)
+
+
+def _fits_float32(value: float) -> bool:
+    try:
+        return struct.unpack("<f", struct.pack("<f", value))[0] == value
+    except OverflowError:
+        return False
+
+
+def serialize_binary(sections: Sequence[GDSection], real64: bool = False) -> bytes:
+    """
+    Encode the sections of a resource file in the binary format
+
+    Only resources can be written. Real numbers are stored as 32-bit floats, so
+    values that need more precision are rounded like they are in Godot, unless
+    real64 is True. That writes them as doubles, like Godot builds with
+    double-precision real_t do.
+    """
+    header = sections[0].header
+    if header.name != "gd_resource":
+        raise GodotBinaryException(
+            "Only resources can be written in the binary format, not %s" % header.name
+        )
+    externals = [s for s in sections if s.header.name == "ext_resource"]
+    internals = [s for s in sections if s.header.name == "sub_resource"]
+    internals += [s for s in sections if s.header.name == "resource"]
+    if not internals or internals[-1].header.name != "resource":
+        raise GodotBinaryException("Binary resources need a [resource] section")
+
+    godot4 = header.get("format") == 3
+    writer = _Writer(godot4, real64)
+    writer.external_indexes = {s.header["id"]: i for i, s in enumerate(externals)}
+    paths = []
+    for i, section in enumerate(internals[:-1]):
+        sub_id = section.header["id"]
+        if godot4:
+            writer.internal_indexes[sub_id] = i
+        elif isinstance(sub_id, int):
+            writer.internal_indexes[sub_id] = sub_id
+        else:
+            raise GodotBinaryException(
+                "sub_resource ids must be integers in Godot 3 resources"
+            )
+        paths.append("local://%s" % sub_id)
+    paths.append("")
+
+    bodies = []
+    for section in internals:
+        writer.buffer = bytearray()
+        if section.header.name == "resource":
+            writer.string(header.get("type", "Resource"))
+        else:
+            writer.string(section.header["type"])
+        properties = list(section.properties.items())
+        writer.pack("I", len(properties))
+        for k, v in properties:
+            writer.pack("I", writer.string_index(k))
+            writer.variant(v)
+        bodies.append(bytes(writer.buffer))
+
+    writer.buffer = bytearray(MAGIC)
+    if godot4:
+        writer.pack("5I", 0, real64, 4, 0, 5)
+    else:
+        writer.pack("5I", 0, real64, 3, 5, 3)
+    writer.string(header.get("type", "Resource"))
+    writer.pack("Q", 0)
+    if godot4:
+        script_class = header.get("script_class")
+        flags = FLAG_NAMED_SCENE_IDS | FLAG_UIDS
+        if real64:
+            flags |= FLAG_REAL_T_IS_DOUBLE
+        if script_class is not None:
+            flags |= FLAG_HAS_SCRIPT_CLASS
+        writer.pack("IQ", flags, _uid(header))
+        if script_class is not None:
+            writer.string(script_class)
+        writer.pack("11I", *[0] * 11)
+    else:
+        writer.pack("14I", *[0] * 14)
+
+    writer.pack("I", len(writer.strings))
+    for string in writer.strings:
+        writer.string(string)
+    writer.pack("I", len(externals))
+    for section in externals:
+        writer.string(section.header["type"])
+        writer.string(section.header["path"])
+        if godot4:
+            writer.pack("Q", _uid(section.header))
+
+    writer.pack("I", len(internals))
+    offset = len(writer.buffer) + sum(
+        4 + len(path.encode("utf-8")) + 1 + 8 for path in paths
+    )
+    for path, body in zip(paths, bodies):
+        writer.string(path)
+        writer.pack("Q", offset)
+        offset += len(body)
+    for body in bodies:
+        writer.buffer += body
+    writer.buffer += MAGIC
+    return bytes(writer.buffer)
+
+
+def _uid(header: GDSectionHeader) -> int:
+    uid = header.get("uid")
+    return _INVALID_UID if uid is None else text_to_uid(uid)
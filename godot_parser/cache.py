@@ -0,0 +1,227 @@
+""" Caches for loaded Godot files """
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple, TypeVar
+
+__all__ = ["DiskCache", "FileCache"]
+
+# Bump this when the pickled form of GDFile changes
+CACHE_FORMAT = 2
+
+T = TypeVar("T")
+
+# (mtime, size, inode)
+Stamp = Tuple[int, int, int]
+
+
+def default_cache_dir() -> str:
+    """$GODOT_PARSER_CACHE_DIR, or godot_parser in the user's cache directory"""
+    directory = os.environ.get("GODOT_PARSER_CACHE_DIR")
+    if directory:
+        return directory
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join("~", ".cache")
+    return os.path.join(os.path.expanduser(cache_home), "godot_parser")
+
+
+class DiskCache(object):
+    """
+    Persistent cache of loaded files, keyed by a hash of their contents
+
+    Pass it to GDFile.load to skip parsing files that have been loaded before::
+
+        cache = DiskCache(max_size=64 * 1024 * 1024)
+        scene = GDScene.load("Player.tscn", engine="fast", cache=cache)
+
+    Entries are pickled, so the directory must not be writable by anyone you don't
+    trust. The key includes the library version and the load options, so upgrading
+    godot_parser never returns stale results. When the entries take up more than
+    max_size bytes, the least recently used ones are deleted.
+    """
+
+    def __init__(
+        self, directory: Optional[str] = None, max_size: int = 256 * 1024 * 1024
+    ) -> None:
+        self.directory = directory or default_cache_dir()
+        self.max_size = max_size
+
+    def key(self, data: bytes, options: Hashable) -> str:
+        """Hash file contents together with the options used to load them"""
+        from . import __version__  # pylint: disable=import-outside-toplevel
+
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(repr((__version__, CACHE_FORMAT, options)).encode("utf-8"))
+        digest.update(data)
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".pickle")
+
+    def load(self, filepath: str, options: Hashable, loader: Callable[[], T]) -> T:
+        """Return the cached result for filepath, or call loader and cache the result"""
+        with open(filepath, "rb") as ifile:
+            key = self.key(ifile.read(), options)
+        value = self.get(key)
+        if value is not None:
+            return value
+        value = loader()
+        # Don't cache the result under the old key if the file changed while loading
+        with open(filepath, "rb") as ifile:
+            if self.key(ifile.read(), options) == key:
+                self.put(key, value)
+        return value
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the entry for a key, or None"""
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as ifile:
+                value = pickle.load(ifile)
+        except FileNotFoundError:
+            return None
+        except Exception:  # pylint: disable=broad-except
+            # Truncated or written by an incompatible version
+            self._remove(path)
+            return None
+        try:
+            # Entries are evicted by modification time
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """Store an entry and evict old ones if the cache is over max_size"""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as ofile:
+                pickle.dump(value, ofile, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._entry_path(key))
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self) -> None:
+        """Delete the least recently used entries until the cache fits in max_size"""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".pickle"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self) -> None:
+        """Delete all entries"""
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith(".pickle"):
+                self._remove(os.path.join(self.directory, name))
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class FileCache(object):
+    """
+    In-memory cache of loaded files, for processes that load the same paths repeatedly
+
+    Pass it to GDFile.load like a DiskCache::
+
+        cache = FileCache(max_entries=64)
+        scene = GDScene.load("Player.tscn", cache=cache)
+
+    Entries are checked against the file's mtime, size and inode on every load. Each
+    load returns a new copy, so callers can modify it without affecting the cache.
+    The copies are made from a pickled form of the file, and the size of that is the
+    memory estimate used for max_memory. The least recently used entries are evicted
+    when there are more than max_entries or they take up more than max_memory bytes.
+
+    The hits, misses and evictions counters can be used to tune the limits.
+    """
+
+    def __init__(
+        self, max_entries: Optional[int] = 128, max_memory: Optional[int] = None
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_memory = max_memory
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.memory = 0
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[Stamp, bytes]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self, filepath: str, options: Hashable, loader: Callable[[], T]) -> T:
+        """Return a copy of the cached result for filepath, or call loader"""
+        key = (os.path.abspath(filepath), options)
+        stamp = stat_stamp(filepath)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                data = entry[1]
+            else:
+                self.misses += 1
+                data = None
+        if data is not None:
+            return pickle.loads(data)
+        value = loader()
+        # Don't cache the result if the file changed while loading
+        if stat_stamp(filepath) == stamp:
+            self.put(key, stamp, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        return value
+
+    def put(self, key: Tuple[str, Hashable], stamp: Stamp, data: bytes) -> None:
+        """Store an entry and evict old ones if the cache is over its limits"""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.memory -= len(old[1])
+            self._entries[key] = (stamp, data)
+            self.memory += len(data)
+            while self._entries and (
+                (self.max_entries is not None and len(self._entries) > self.max_entries)
+                or (self.max_memory is not None and self.memory > self.max_memory)
+            ):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.memory -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Delete all entries"""
+        with self._lock:
+            self._entries.clear()
+            self.memory = 0
+
+
+def stat_stamp(filepath: str) -> Stamp:
+    stat = os.stat(filepath)
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
@@ -1,17 +1,36 @@
+import mmap
 import os
+import secrets
+import stat
+import threading
 from contextlib import contextmanager
 from typing import (
+    IO,
+    Any,
+    AnyStr,
+    Callable,
+    Dict,
     Iterable,
     Iterator,
     List,
     Optional,
     Sequence,
+    Set,
+    Tuple,
     Type,
     Union,
     cast,
 )
 
+from .cache import DiskCache, FileCache
+from .index import SCENE_ORDER, SectionIndex, SectionList, field_getter
 from .objects import ExtResource, GDObject, SubResource
+from .parser import (
+    iter_sections,
+    parse_buffer_parallel,
+    parse_sections,
+    reparse_sections,
+)
 from .sections import (
     GDExtResourceSection,
     GDNodeSection,
@@ -19,23 +38,14 @@ from .sections import (
     GDSectionHeader,
     GDSubResourceSection,
 )
-from .structure import scene_file
-from .util import find_project_root, gdpath_to_filepath
+from .util import find_project_root, gdpath_to_filepath, is_binary_stream
 
 __all__ = ["GDFile", "GDScene", "GDResource"]
 
-# Scene and resource files seem to group the section types together and sort them.
-# This is the order I've observed
-SCENE_ORDER = [
-    "gd_scene",
-    "gd_resource",
-    "ext_resource",
-    "sub_resource",
-    "resource",
-    "node",
-    "connection",
-    "editable",
-]
+_PYPARSING_LOCK = threading.Lock()
+
+# Many scenes usually inherit from the same few parents
+PARENT_SCENE_CACHE = FileCache(max_entries=64)
 
 
 class GodotFileException(Exception):
@@ -46,42 +56,197 @@ class GDFile(object):
     """Base class representing the contents of a Godot file"""
 
     project_root: Optional[str] = None
+    # Give new resources the lowest unused ids instead of ids after the highest one
+    reuse_resource_ids = False
+    # Lookup tables for the sections, built when they are first needed
+    _index: Optional[SectionIndex] = None
+    # Section type -> fields to index, from add_index()
+    _index_fields: Optional[Dict[str, List[str]]] = None
 
     def __init__(self, *sections: GDSection) -> None:
-        self._sections = list(sections)
+        self._sections = SectionList(sections)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        # The index is cheap to build again, and only valid in this process
+        state.pop("_index", None)
+        return state
+
+    def _get_index(self) -> SectionIndex:
+        """Return the index of the sections, and build it if it isn't valid"""
+        index = self._index
+        if index is None or not index.is_valid(self._sections):
+            index = self._index = SectionIndex(self._sections, self._index_fields)
+        return index
+
+    def add_index(self, section_name: str, field: str) -> None:
+        """
+        Index the sections of a type by a field, to speed up queries (see Query)
+
+        The field is written like in Query.where(), e.g. "type" or
+        "props__collision_layer". Queries for one or a few values of the field only
+        look at the sections with those values. Changing the field of any indexed
+        section makes the file index all of its sections again on the next lookup,
+        so only index fields that are looked up more often than they change.
+
+        Changes made in place to a value, like node["position"].x = 3, are only
+        noticed when the value is read. A value read before a lookup and changed
+        after it isn't indexed again until it is set, so for fields inside a value
+        like "props__position__x", set the whole value::
+
+            position = node["position"]
+            position.x = 3
+            node["position"] = position
+        """
+        field_getter(field)
+        if self._index_fields is None:
+            self._index_fields = {}
+        fields = self._index_fields.setdefault(section_name, [])
+        if field not in fields:
+            fields.append(field)
+            self._index = None
+
+    def query(self, section_name_: Optional[str] = None) -> "Query":
+        """Query the sections, or the sections of a type (see Query)"""
+        return Query(self, section_name_)
+
+    def _valid_index(self) -> Optional[SectionIndex]:
+        """Return the index of the sections if it exists and is valid"""
+        index = self._index
+        if index is not None and index.is_valid(self._sections):
+            return index
+        return None
 
     def add_section(self, new_section: GDSection) -> int:
         """Add a section to the file and return the index of that section"""
+        index = self._get_index()
         new_idx = SCENE_ORDER.index(new_section.header.name)
+        if index.ordered:
+            # Skip past the sections that come before it by counting them
+            i = index.insertion_point(new_idx)
+            self._sections.insert(i, new_section)
+            index.append(new_section)
+            index.mark_valid(self._sections)
+            return i
         for i, section in enumerate(self._sections):
             idx = SCENE_ORDER.index(section.header.name)
             if new_idx < idx:  # type: ignore
                 self._sections.insert(i, new_section)
+                # It may have been added before other sections of its type
+                self._index = None
                 return i
         self._sections.append(new_section)
+        index.append(new_section)
+        index.mark_valid(self._sections)
         return len(self._sections) - 1
 
+    def add_sections(self, new_sections: Iterable[GDSection]) -> None:
+        """
+        Add several sections to the file
+
+        This puts the sections in the same places as calling add_section for each of
+        them, but takes one pass over the file instead of one per section.
+        """
+        new_sections = list(new_sections)
+        by_type: Dict[str, List[GDSection]] = {}
+        for section in new_sections:
+            # Raise for unknown types before changing anything, like add_section
+            SCENE_ORDER.index(section.header.name)
+            by_type.setdefault(section.header.name, []).append(section)
+        index = self._get_index()
+        if not index.ordered:
+            for section in new_sections:
+                self.add_section(section)
+            return
+        # Sorted files are just the sections of each type one after the other
+        sections: List[GDSection] = []
+        for name in SCENE_ORDER:
+            sections.extend(index.by_type.get(name, ()))
+            sections.extend(by_type.get(name, ()))
+        self._sections[:] = sections
+        for name in SCENE_ORDER:
+            for section in by_type.get(name, ()):
+                index.append(section)
+        index.mark_valid(self._sections)
+
     def remove_section(self, section: GDSection) -> bool:
-        """Remove a section from the file"""
-        idx = -1
-        for i, s in enumerate(self._sections):
-            if section == s:
-                idx = i
-                break
-        if idx == -1:
+        """
+        Remove a section from the file
+
+        The section is found by identity, or if it isn't in the file, by equality.
+        Returns False if there is no such section.
+        """
+        idx = self._find_position(section)
+        if idx is None:
             return False
         self.remove_at(idx)
         return True
 
+    def remove_sections(
+        self, sections: Union[Iterable[GDSection], Callable[[GDSection], bool]]
+    ) -> List[GDSection]:
+        """
+        Remove several sections in one pass and return them
+
+        Pass the sections to remove, which are found by identity, or a function that
+        returns True for the sections to remove::
+
+            scene.remove_sections(lambda section: section.header.name == "connection")
+        """
+        if callable(sections):
+            predicate = sections
+        else:
+            ids = {id(section) for section in sections}
+
+            def predicate(section: GDSection) -> bool:
+                return id(section) in ids
+
+        kept: List[GDSection] = []
+        removed: List[GDSection] = []
+        for section in self._sections:
+            (removed if predicate(section) else kept).append(section)
+        if removed:
+            self._sections[:] = kept
+            # Rebuilding the index is faster than removing many sections from it
+            self._index = None
+        return removed
+
+    def _find_position(self, section: GDSection) -> Optional[int]:
+        """The index of a section in the file, by identity or else by equality"""
+        index = self._get_index()
+        # Sections can only be equal to sections of the same type
+        same_type = index.by_type.get(section.header.name, [])
+        for i, s in enumerate(same_type):
+            if s is section:
+                break
+        else:
+            for i, s in enumerate(same_type):
+                if s == section:
+                    break
+            else:
+                return None
+        if index.ordered:
+            rank = SCENE_ORDER.index(section.header.name)
+            return index.insertion_point(rank) - len(same_type) + i
+        for i, s2 in enumerate(self._sections):
+            if s2 is s:
+                return i
+        raise AssertionError("Indexed section is missing from the file")
+
     def remove_at(self, index: int) -> GDSection:
         """Remove a section at an index"""
-        return self._sections.pop(index)
+        section_index = self._valid_index()
+        section = self._sections.pop(index)
+        if section_index is not None:
+            section_index.remove(section)
+            section_index.mark_valid(self._sections)
+        return section
 
     def get_sections(self, name: Optional[str] = None) -> List[GDSection]:
         """Get all sections, or all sections of a given type"""
         if name is None:
             return self._sections
-        return [s for s in self._sections if s.header.name == name]
+        return list(self._get_index().by_type.get(name, ()))
 
     def get_nodes(self) -> List[GDNodeSection]:
         """Get all [node] sections"""
@@ -154,7 +319,12 @@ class GDFile(object):
         **constraints
     ) -> Iterable[GDSection]:
         """Same as find_section, but returns all matches"""
-        for section in self.get_sections(section_name_):
+        if section_name_ is None:
+            sections = self._sections
+        else:
+            # Copy it, since the caller may change the file while iterating
+            sections = list(self._get_index().candidates(section_name_, constraints))
+        for section in sections:
             found = True
             for k, v in constraints.items():
                 if getattr(section, k, None) == v:
@@ -173,18 +343,69 @@ class GDFile(object):
 
     def add_ext_resource(self, path: str, type: str) -> GDExtResourceSection:
         """Add an ext_resource"""
-        next_id = 1 + max([s.id for s in self.get_ext_resources()] + [0])
-        section = GDExtResourceSection(path, type, next_id)
+        count = len(self._get_index().by_type.get("ext_resource", ()))
+        (id,) = self._new_resource_ids("ext_resource", [str(count + 1)])
+        section = GDExtResourceSection(path, type, id)
         self.add_section(section)
         return section
 
+    def add_ext_resources(
+        self, resources: Iterable[Tuple[str, str]]
+    ) -> List[GDExtResourceSection]:
+        """Add an ext_resource for each (path, type) and return them"""
+        resources = list(resources)
+        count = len(self._get_index().by_type.get("ext_resource", ()))
+        ids = self._new_resource_ids(
+            "ext_resource", [str(count + i + 1) for i in range(len(resources))]
+        )
+        sections = [
+            GDExtResourceSection(path, type, id)
+            for (path, type), id in zip(resources, ids)
+        ]
+        self.add_sections(sections)
+        return sections
+
     def add_sub_resource(self, type: str, **kwargs) -> GDSubResourceSection:
         """Add a sub_resource"""
-        next_id = 1 + max([s.id for s in self.get_sub_resources()] + [0])
-        section = GDSubResourceSection(type, next_id, **kwargs)
+        (id,) = self._new_resource_ids("sub_resource", [type])
+        section = GDSubResourceSection(type, id, **kwargs)
         self.add_section(section)
         return section
 
+    def _new_resource_ids(
+        self, section_name: str, prefixes: List[str]
+    ) -> List[Union[int, str]]:
+        """
+        Pick ids for new resources
+
+        Files in the Godot 4 format get ids like Godot 4 uses, which start with the
+        prefix. Others get integer ids (see reuse_resource_ids).
+        """
+        index = self._get_index()
+        if not self._uses_string_ids():
+            return list(
+                index.new_int_ids(
+                    section_name, len(prefixes), reuse=self.reuse_resource_ids
+                )
+            )
+        ids: List[Union[int, str]] = []
+        taken: Set[str] = set()
+        for prefix in prefixes:
+            id = index.new_string_id(section_name, prefix, taken)
+            taken.add(id)
+            ids.append(id)
+        return ids
+
+    def _uses_string_ids(self) -> bool:
+        """True if the file is in the Godot 4 format, which uses string resource ids"""
+        if not self._sections:
+            return False
+        header = self._sections[0].header
+        if header.name not in ("gd_scene", "gd_resource"):
+            return False
+        format = header._attributes.get("format")
+        return isinstance(format, int) and format >= 3
+
     def add_node(
         self,
         name: str,
@@ -242,7 +463,7 @@ class GDFile(object):
             return None
         return parent_res.path
 
-    def load_parent_scene(self) -> "GDScene":
+    def _parent_scene_path(self) -> str:
         if self.project_root is None:
             raise RuntimeError(
                 "load_parent_scene() requires a project_root on the GDFile"
@@ -255,7 +476,16 @@ class GDFile(object):
             raise RuntimeError(
                 "Could not find parent scene resource id(%d)" % root.instance
             )
-        scene = GDScene.load(gdpath_to_filepath(self.project_root, parent_res.path))
+        return gdpath_to_filepath(self.project_root, parent_res.path)
+
+    def load_parent_scene(self) -> "GDScene":
+        """
+        Load the scene that this scene inherits from
+
+        Parent scenes are kept in PARENT_SCENE_CACHE until they change on disk, so
+        scenes that share a parent only parse it once.
+        """
+        scene = GDScene.load(self._parent_scene_path(), cache=PARENT_SCENE_CACHE)
         assert isinstance(scene, GDScene)
         return scene
 
@@ -279,17 +509,19 @@ class GDFile(object):
 
         tree = Tree.build(self)
         yield tree
-        for i in range(len(self._sections) - 1, -1, -1):
-            section = self._sections[i]
-            if section.header.name == "node":
-                self._sections.pop(i)
         nodes = tree.flatten()
-        if not nodes:
-            return
-        # Let's find out where the root node belongs and then bulk add the rest at that
-        # index
-        i = self.add_section(nodes[0])
-        self._sections[i + 1 : i + 1] = nodes[1:]
+        index = self._valid_index()
+        self._index = None
+        self._sections[:] = [s for s in self._sections if s.header.name != "node"]
+        if nodes:
+            # Let's find out where the root node belongs and then bulk add the rest at
+            # that index
+            i = self.add_section(nodes[0])
+            self._sections[i + 1 : i + 1] = nodes[1:]
+        if index is not None:
+            index.replace_type("node", nodes)
+            index.mark_valid(self._sections)
+            self._index = index
 
     def get_node(self, path: str = ".") -> Optional[GDNodeSection]:
         """Mimics the Godot get_node API"""
@@ -300,49 +532,282 @@ class GDFile(object):
         return node.section if node is not None else None
 
     @classmethod
-    def parse(cls, contents: str):
-        """Parse the contents of a Godot file"""
-        parsed_scene = scene_file.parse_string(contents, parseAll=True)
+    def parse(cls, contents: str, engine: str = "pyparsing", lazy: bool = False):
+        """
+        Parse the contents of a Godot file
+
+        The default "pyparsing" engine is the reference implementation. Pass
+        engine="fast" to use the hand-written parser in parser.py, which produces the
+        same sections and is much faster on large files. It also remembers the source
+        text of each section, and sections that aren't changed are written back out
+        exactly as they were (see GDSection.unmodified_source).
+
+        Pass lazy=True to only parse the section headers up front. Property values are
+        decoded the first time they are accessed, and values that are never accessed
+        are written back out verbatim. Lazy parsing always uses the fast engine.
+        """
+        if lazy or engine == "fast":
+            parsed_scene = parse_sections(contents, lazy=lazy)
+        elif engine == "pyparsing":
+            # Building the grammar is slow, so only do it the first time it's used
+            from .structure import (  # pylint: disable=import-outside-toplevel
+                scene_file,
+            )
+
+            # pyparsing works out the arguments of parse actions on their first
+            # calls, which fails when two threads make them at the same time
+            with _PYPARSING_LOCK:
+                parsed_scene = scene_file.parse_string(contents, parseAll=True)
+        else:
+            raise ValueError("Unknown parser engine '%s'" % engine)
         return cls.from_parser(parsed_scene)
 
     @classmethod
-    def load(cls, filepath: str):
-        with open(filepath, "r", encoding="utf-8") as ifile:
-            try:
-                file = cls.parse(ifile.read())
-            except UnicodeDecodeError:
-                raise NotImplementedError(  # pylint: disable=W0707
-                    "Error loading %s: godot_parser does not support binary scenes"
-                    % filepath
-                )
+    def load(
+        cls,
+        filepath: str,
+        engine: str = "pyparsing",
+        lazy: bool = False,
+        sections: Optional[Iterable[str]] = None,
+        stop_after_last: bool = False,
+        memory_map: bool = False,
+        workers: int = 1,
+        cache: Optional[Union[DiskCache, FileCache]] = None,
+    ):
+        """
+        Load a Godot file from disk (see parse)
+
+        Pass a set of section types to only load those sections. Other sections are
+        skipped without being parsed, and the gd_scene/gd_resource section is always
+        included. With stop_after_last=True, reading stops as soon as SCENE_ORDER
+        guarantees that no more of the requested sections can appear. For example::
+
+            # Only reads the file up to the first [sub_resource] or [node]
+            GDFile.load("Player.tscn", sections={"ext_resource"}, stop_after_last=True)
+
+        Pass memory_map=True to memory-map the file and decode it one section at a
+        time instead of reading it into a single string.
+
+        Pass workers > 1 to split the file at section boundaries and parse the pieces
+        in that many processes. This is ignored when loading selected sections, which
+        is sequential.
+
+        Selective, memory-mapped and parallel loading always use the fast engine.
+
+        Binary .res/.scn files are detected automatically (see from_binary).
+
+        Pass a DiskCache to return the cached result when the same contents have been
+        loaded with the same options before, or a FileCache to keep loaded files in
+        memory.
+        """
+        if cache is not None:
+            if sections is not None:
+                sections = frozenset(sections)
+            options = (
+                cls.__name__,
+                engine,
+                lazy,
+                None if sections is None else tuple(sorted(sections)),
+                stop_after_last,
+            )
+            file = cache.load(
+                filepath,
+                options,
+                lambda: cls.load(
+                    filepath,
+                    engine,
+                    lazy,
+                    sections,
+                    stop_after_last,
+                    memory_map,
+                    workers,
+                ),
+            )
+            # The same contents may have been cached from a different project
+            file.project_root = find_project_root(filepath)
+            return file
+        from .binary import is_binary  # pylint: disable=import-outside-toplevel
+
+        with open(filepath, "rb") as ifile:
+            binary = is_binary(ifile.read(4))
+        try:
+            if binary:
+                with open(filepath, "rb") as ifile:
+                    file = cls.from_binary(ifile.read())
+            elif workers > 1 and sections is None:
+                with _map_file(filepath) as buffer:
+                    file = cls.from_parser(
+                        parse_buffer_parallel(buffer, workers, lazy=lazy)
+                    )
+            elif memory_map:
+                with _map_file(filepath) as buffer:
+                    file = cls._load_sections(buffer, lazy, sections, stop_after_last)
+            else:
+                with open(filepath, "r", encoding="utf-8") as ifile:
+                    if sections is None:
+                        file = cls.parse(ifile.read(), engine=engine, lazy=lazy)
+                    else:
+                        file = cls._load_sections(
+                            ifile, lazy, sections, stop_after_last
+                        )
+        except UnicodeDecodeError:
+            raise NotImplementedError(  # pylint: disable=W0707
+                "Error loading %s: godot_parser does not support binary scenes"
+                % filepath
+            )
         file.project_root = find_project_root(filepath)
         return file
 
+    @classmethod
+    def _load_sections(
+        cls,
+        source: Union[Iterable[str], bytes, mmap.mmap],
+        lazy: bool,
+        sections: Optional[Iterable[str]],
+        stop_after_last: bool,
+    ):
+        section_types = stop_at = None
+        if sections is not None:
+            section_types = set(sections) | {"gd_scene", "gd_resource"}
+            if stop_after_last and section_types.issubset(SCENE_ORDER):
+                last = max(SCENE_ORDER.index(name) for name in section_types)
+                stop_at = set(SCENE_ORDER[last + 1 :])
+        return cls.from_parser(
+            list(iter_sections(source, lazy, section_types, stop_at=stop_at))
+        )
+
+    def reparse(
+        self, contents: str, offset: int, removed: int, inserted: str
+    ) -> "GDFile":
+        """
+        Apply an edit to the text this file was parsed from and parse it again
+
+        The edit replaces contents[offset:offset + removed] with inserted. Only the
+        sections that overlap the edit are parsed again and the rest of the section
+        objects are reused, so this is much faster than parse() for small edits to a
+        large file. The file should have been parsed with engine="fast"; otherwise
+        the whole new text is parsed. Returns a new file.
+        """
+        file = GDFile.from_parser(
+            reparse_sections(self._sections, contents, offset, removed, inserted)
+        )
+        file.project_root = self.project_root
+        return file
+
     @classmethod
     def from_parser(cls, parse_result):
         first_section = parse_result[0]
         if first_section.header.name == "gd_scene":
             scene = GDScene.__new__(GDScene)
-            scene._sections = list(parse_result)
+            scene._sections = SectionList(parse_result)
             return scene
         elif first_section.header.name == "gd_resource":
             resource = GDResource.__new__(GDResource)
-            resource._sections = list(parse_result)
+            resource._sections = SectionList(parse_result)
             return resource
 
         return cls(*parse_result)
 
-    def write(self, filename: str):
-        """Writes this to a file"""
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        with open(filename, "w", encoding="utf-8") as ofile:
-            ofile.write(str(self))
+    @classmethod
+    def from_binary(cls, data: bytes):
+        """
+        Read a resource in Godot's binary format
+
+        Binary scenes are read as a PackedScene resource (see binary.py).
+        """
+        from .binary import parse_binary  # pylint: disable=import-outside-toplevel
+
+        return cls.from_parser(parse_binary(data))
+
+    def to_binary(self, real64: bool = False) -> bytes:
+        """
+        Encode this resource in Godot's binary format
+
+        Real numbers are stored as doubles if real64 is True (see serialize_binary).
+        """
+        from .binary import (  # pylint: disable=import-outside-toplevel
+            serialize_binary,
+        )
+
+        return serialize_binary(self._sections, real64)
+
+    def write(
+        self,
+        filename: str,
+        binary: bool = False,
+        only_if_changed: bool = False,
+        atomic: bool = False,
+    ) -> bool:
+        """
+        Writes this to a file, in Godot's binary format if binary is True
+
+        With only_if_changed=True, the file is left alone if it already has these
+        contents, so that Godot doesn't reimport it. The comparison streams the
+        output like the write itself does.
+
+        With atomic=True, the output is written to a temporary file that then
+        replaces the file, so nothing ever sees it half written.
+
+        Returns whether the file was written.
+        """
+        if binary:
+            data = self.to_binary()
+            if only_if_changed and _file_matches(filename, [data], "rb"):
+                return False
+            with _open_for_write(filename, "wb", atomic) as ofile:
+                ofile.write(data)
+            return True
+        if only_if_changed:
+            chunks: Iterable[str] = self.iter_serialized()
+            if os.linesep != "\n":
+                # Text mode writes os.linesep for each newline
+                chunks = (chunk.replace("\n", os.linesep) for chunk in chunks)
+            if _file_matches(filename, chunks, "r"):
+                return False
+        with _open_for_write(filename, "w", atomic) as ofile:
+            self.dump(ofile)
+        return True
+
+    async def awrite(
+        self, filename: str, executor: Optional[Any] = None, **kwargs: Any
+    ) -> bool:
+        """Write this in an executor without blocking the event loop (see aio.awrite)"""
+        from .aio import awrite  # pylint: disable=import-outside-toplevel
+
+        return await awrite(self, filename, executor, **kwargs)
+
+    def iter_serialized(self) -> Iterator[str]:
+        """
+        Serialize this file in pieces, without building the whole string
+
+        The pieces are a section header, a property line, or an untouched section.
+        """
+        for i, section in enumerate(self._sections):
+            if i:
+                yield "\n\n"
+            yield from section.iter_serialized()
+        yield "\n"
+
+    def dump(self, stream: Any) -> None:
+        """Write this to a text stream, or to a binary stream as UTF-8"""
+        if is_binary_stream(stream):
+            for chunk in self.iter_serialized():
+                stream.write(chunk.encode("utf-8"))
+        else:
+            for chunk in self.iter_serialized():
+                stream.write(chunk)
 
     def __str__(self) -> str:
-        return "\n\n".join([str(s) for s in self._sections]) + "\n"
+        out: List[str] = []
+        for i, section in enumerate(self._sections):
+            if i:
+                out.append("\n\n")
+            section._serialize(out)
+        out.append("\n")
+        return "".join(out)
 
     def __repr__(self) -> str:
-        return "%s(%s)" % (type(self).__name__, self.__str__())
+        return "%s(%s)" % (type(self).__name__, "".join(self.iter_serialized()))
 
     def __eq__(self, other) -> bool:
         if not isinstance(other, GDFile):
@@ -378,12 +843,32 @@ class GDCommonFile(GDFile):
             self.load_steps += 1
         return idx
 
+    def add_sections(self, new_sections: Iterable[GDSection]) -> None:
+        new_sections = list(new_sections)
+        super().add_sections(new_sections)
+        self.load_steps += sum(
+            1
+            for section in new_sections
+            if section.header.name in ["ext_resource", "sub_resource"]
+        )
+
     def remove_at(self, index: int):
-        section = self._sections.pop(index)
+        section = super().remove_at(index)
         if section.header.name in ["ext_resource", "sub_resource"]:
             self.load_steps -= 1
         return section
 
+    def remove_sections(
+        self, sections: Union[Iterable[GDSection], Callable[[GDSection], bool]]
+    ) -> List[GDSection]:
+        removed = super().remove_sections(sections)
+        self.load_steps -= sum(
+            1
+            for section in removed
+            if section.header.name in ["ext_resource", "sub_resource"]
+        )
+        return removed
+
     def remove_unused_resources(self):
         self._remove_unused_resources(self.get_ext_resources(), ExtResource)
         self._remove_unused_resources(self.get_sub_resources(), SubResource)
@@ -398,9 +883,7 @@ class GDCommonFile(GDFile):
             if isinstance(ref, reference_type):
                 seen.add(ref.id)
         if len(seen) < len(sections):
-            to_remove = [s for s in sections if s.id not in seen]
-            for s in to_remove:
-                self.remove_section(s)
+            self.remove_sections([s for s in sections if s.id not in seen])
 
     def renumber_resource_ids(self):
         """Refactor all resource IDs to be sequential with no gaps"""
@@ -410,24 +893,24 @@ class GDCommonFile(GDFile):
     def _iter_node_resource_references(
         self,
     ) -> Iterator[Union[ExtResource, SubResource]]:
-        def iter_resources(value):
-            if isinstance(value, (ExtResource, SubResource)):
-                yield value
-            elif isinstance(value, list):
-                for v in value:
-                    yield from iter_resources(v)
-            elif isinstance(value, dict):
-                for v in value.values():
-                    yield from iter_resources(v)
-            elif isinstance(value, GDObject):
-                for v in value.args:
-                    yield from iter_resources(v)
+        for _, _, _, value in self._iter_resource_values():
+            yield from _iter_resources(value)
 
+    def _iter_resource_values(self) -> Iterator[Tuple[GDSection, bool, str, Any]]:
+        """
+        Iterate over the header attributes and properties that may reference resources
+
+        Yields the section, True for a header attribute or False for a property, the
+        key and the value. Reading the values this way doesn't count as a change.
+        """
         for node in self.get_nodes():
-            yield from iter_resources(node.header.attributes)
-            yield from iter_resources(node.properties)
+            for k, v in node.header._attributes.items():
+                yield node, True, k, v
+            for k, v in node._copy_properties().items():
+                yield node, False, k, v
         for resource in self.get_sections("resource"):
-            yield from iter_resources(resource.properties)
+            for k, v in resource._copy_properties().items():
+                yield resource, False, k, v
 
     def _renumber_resource_ids(
         self,
@@ -441,12 +924,25 @@ class GDCommonFile(GDFile):
             section.id = i + 1
 
         # Now we update all references to use the new number
-        for ref in self._iter_node_resource_references():
-            if isinstance(ref, reference_type):
-                try:
-                    ref.id = id_map[ref.id]
-                except KeyError as e:
-                    raise GodotFileException("Unknown resource ID %d" % ref.id) from e
+        for section, in_header, k, value in self._iter_resource_values():
+            changed = False
+            for ref in _iter_resources(value):
+                if isinstance(ref, reference_type):
+                    try:
+                        new_id = id_map[ref.id]
+                    except KeyError as e:
+                        raise GodotFileException(
+                            "Unknown resource ID %d" % ref.id
+                        ) from e
+                    if new_id != ref.id:
+                        ref.id = new_id
+                        changed = True
+            if changed:
+                # Set the value again so that the section knows it changed
+                if in_header:
+                    section.header[k] = value
+                else:
+                    section[k] = value
 
 
 class GDScene(GDCommonFile):
@@ -460,3 +956,76 @@ class GDResource(GDCommonFile):
 
 
 GDFileType = Union[GDFile, GDScene, GDResource]
+
+
+def _iter_resources(value: Any) -> Iterator[Union[ExtResource, SubResource]]:
+    """Find the resource references in a value"""
+    if isinstance(value, (ExtResource, SubResource)):
+        yield value
+    elif isinstance(value, list):
+        for v in value:
+            yield from _iter_resources(v)
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from _iter_resources(v)
+    elif isinstance(value, GDObject):
+        for v in value.args:
+            yield from _iter_resources(v)
+
+
+def _file_matches(filename: str, chunks: Iterable[AnyStr], mode: str) -> bool:
+    """Check if a file contains exactly the concatenated chunks"""
+    encoding, newline = (None, None) if "b" in mode else ("utf-8", "")
+    try:
+        with open(filename, mode, encoding=encoding, newline=newline) as ifile:
+            for chunk in chunks:
+                if ifile.read(len(chunk)) != chunk:
+                    return False
+            return not ifile.read(1)
+    except (FileNotFoundError, UnicodeDecodeError):
+        return False
+
+
+@contextmanager
+def _open_for_write(filename: str, mode: str, atomic: bool) -> Iterator[IO]:
+    directory = os.path.dirname(filename)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+    encoding = None if "b" in mode else "utf-8"
+    if not atomic:
+        with open(filename, mode, encoding=encoding) as ofile:
+            yield ofile
+        return
+    tmp_path = "%s.%s.tmp" % (filename, secrets.token_hex(4))
+    # Create the file like open() would, with the default permissions
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        try:
+            # Keep the permissions of the file being replaced
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(filename).st_mode))
+        except FileNotFoundError:
+            pass
+        with open(fd, mode, encoding=encoding) as ofile:
+            yield ofile
+        os.replace(tmp_path, filename)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+@contextmanager
+def _map_file(filepath: str) -> Iterator[Union[bytes, mmap.mmap]]:
+    with open(filepath, "rb") as ifile:
+        if os.fstat(ifile.fileno()).st_size == 0:
+            # Empty files cannot be mapped
+            yield b""
+            return
+        with mmap.mmap(ifile.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+
+
+# query.py needs GDFile, so this comes after it
+from .query import Query  # pylint: disable=wrong-import-position,cyclic-import
@@ -0,0 +1,437 @@
+""" Lookup tables for finding the sections of a file without scanning all of them """
+import secrets
+import string
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    FrozenSet,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from .sections import (
+    _MISSING,
+    GD_SECTION_REGISTRY,
+    GDSection,
+    LazyProperties,
+    index_generation,
+)
+
+# The value of a field that a section doesn't have
+MISSING = _MISSING
+
+FieldGetter = Callable[[GDSection], Any]
+
+# Scene and resource files seem to group the section types together and sort them.
+# This is the order I've observed
+SCENE_ORDER = [
+    "gd_scene",
+    "gd_resource",
+    "ext_resource",
+    "sub_resource",
+    "resource",
+    "node",
+    "connection",
+    "editable",
+]
+
+SECTION_RANKS = {name: i for i, name in enumerate(SCENE_ORDER)}
+
+# The header attributes that are indexed for each section type
+INDEXED_BY_TYPE = {
+    "ext_resource": ("id", "path"),
+    "sub_resource": ("id",),
+    "node": ("parent", "name"),
+}
+
+RESOURCE_TYPES = ("ext_resource", "sub_resource")
+
+# The characters of the random part of Godot 4 resource ids
+_ID_CHARS = string.ascii_lowercase + string.digits
+
+
+class SectionList(list):
+    """
+    A list of sections that counts the changes made to it
+
+    GDFile keeps its sections in one of these, so that its index notices when the
+    list returned by get_sections() is changed.
+    """
+
+    version = 0
+
+
+def _counts_changes(name: str) -> Callable:
+    method = getattr(list, name)
+
+    def change(self: SectionList, *args: Any, **kwargs: Any) -> Any:
+        self.version += 1
+        return method(self, *args, **kwargs)
+
+    change.__name__ = name
+    return change
+
+
+for _name in (
+    "__setitem__",
+    "__delitem__",
+    "__iadd__",
+    "__imul__",
+    "append",
+    "extend",
+    "insert",
+    "pop",
+    "remove",
+    "clear",
+    "sort",
+    "reverse",
+):
+    setattr(SectionList, _name, _counts_changes(_name))
+
+
+def _version(sections: Sequence[GDSection]) -> Optional[int]:
+    return sections.version if isinstance(sections, SectionList) else None
+
+
+class SectionIndex(object):
+    """
+    The sections of a file by type and by the values of some header attributes
+
+    All of the tables list sections in the order they appear in the file. The index
+    is only valid for the list of sections it was built from while is_valid() is true.
+    Changing an indexed attribute of any section that is in an index makes all
+    indexes invalid, so they have to be built again. So does changing a SectionList
+    other than through the index's owner, which calls mark_valid() after changing
+    the list and the index together.
+
+    fields adds tables for more fields of each section type (see field_getter).
+    """
+
+    def __init__(
+        self,
+        sections: Sequence[GDSection],
+        fields: Optional[Mapping[str, Sequence[str]]] = None,
+    ) -> None:
+        self.generation = index_generation()
+        self.version = _version(sections)
+        self.size = 0
+        self.by_type: Dict[str, List[GDSection]] = {}
+        # (section type, attribute) -> attribute value -> sections. None if some
+        # sections can't be indexed by that attribute.
+        self.by_attribute: Dict[
+            Tuple[str, str], Optional[Dict[Any, List[GDSection]]]
+        ] = {
+            (name, attribute): {}
+            for name, attributes in INDEXED_BY_TYPE.items()
+            for attribute in attributes
+        }
+        self.fields: Dict[str, List[Tuple[str, FieldGetter]]] = {}
+        # Section type -> the header attributes and properties that changing makes
+        # the index invalid
+        self._watched: Dict[str, Tuple[FrozenSet[str], FrozenSet[str]]] = {}
+        for name, names in (fields or {}).items():
+            for field in names:
+                if (name, field) not in self.by_attribute:
+                    self.fields.setdefault(name, []).append(
+                        (field, field_getter(field))
+                    )
+                    self.by_attribute[(name, field)] = {}
+        # The highest integer id of each resource type, if it is known
+        self._max_ids: Dict[str, int] = {}
+        # The lowest integer id of each resource type that may be unused
+        self._lowest_free_ids: Dict[str, int] = {}
+        # True if the sections are sorted by SCENE_ORDER, so that GDFile.add_section
+        # always adds a section after the other sections of its type
+        self.ordered = True
+        last_rank = -1
+        for section in sections:
+            rank = SECTION_RANKS.get(section.header.name, -1)
+            if rank < last_rank or rank == -1:
+                self.ordered = False
+            last_rank = rank
+            self.append(section)
+
+    def is_valid(self, sections: Sequence[GDSection]) -> bool:
+        """True if nothing has changed the sections since they were indexed"""
+        return (
+            self.size == len(sections)
+            and self.version == _version(sections)
+            and self.generation == index_generation()
+        )
+
+    def mark_valid(self, sections: Sequence[GDSection]) -> None:
+        """Accept changes to sections that were also made to the index"""
+        self.version = _version(sections)
+
+    def insertion_point(self, rank: int) -> int:
+        """Where a section of a rank goes in an ordered file, after the ones before it"""
+        return sum(len(self.by_type.get(name, ())) for name in SCENE_ORDER[: rank + 1])
+
+    def append(self, section: GDSection) -> None:
+        """Index a section that comes after the other sections of its type"""
+        header = section.header
+        name = header.name
+        self.by_type.setdefault(name, []).append(section)
+        self.size += 1
+        try:
+            watched = self._watched[name]
+        except KeyError:
+            watched = self._watched[name] = self._watched_fields(name)
+        header._indexed = True
+        header._indexed_attributes, header._indexed_properties = watched
+        if name in self._max_ids:
+            id = header._attributes.get("id")
+            if _is_int(id) and id > self._max_ids[name]:
+                self._max_ids[name] = id
+        attributes = INDEXED_BY_TYPE.get(name, ())
+        if attributes and not isinstance(section, GD_SECTION_REGISTRY[name]):
+            # GDFile.find_all compares the properties of the section classes too
+            for attribute in attributes:
+                self.by_attribute[(name, attribute)] = None
+            return
+        for attribute in attributes:
+            table = self.by_attribute[(name, attribute)]
+            if table is None:
+                continue
+            try:
+                table.setdefault(header._attributes.get(attribute), []).append(section)
+            except TypeError:
+                # Unhashable value
+                self.by_attribute[(name, attribute)] = None
+        for field, getter in self.fields.get(name, ()):
+            table = self.by_attribute[(name, field)]
+            if table is None:
+                continue
+            value = getter(section)
+            if value is MISSING:
+                continue
+            try:
+                table.setdefault(value, []).append(section)
+            except TypeError:
+                self.by_attribute[(name, field)] = None
+
+    def _watched_fields(self, name: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+        """The header attributes and properties that sections of a type are indexed by"""
+        attributes = set(INDEXED_BY_TYPE.get(name, ()))
+        properties: Set[str] = set()
+        for field, _ in self.fields.get(name, ()):
+            parts = field.split("__")
+            if parts[0] == "props":
+                properties.add(parts[1])
+            else:
+                attributes.add(parts[0])
+        return frozenset(attributes), frozenset(properties)
+
+    def remove(self, section: GDSection) -> None:
+        """Remove a section from the index"""
+        header = section.header
+        name = header.name
+        _remove_identical(self.by_type[name], section)
+        self.size -= 1
+        if name in RESOURCE_TYPES:
+            id = header._attributes.get("id")
+            if name in self._max_ids and id == self._max_ids[name]:
+                del self._max_ids[name]
+            if _is_int(id) and id < self._lowest_free_ids.get(name, 1):
+                self._lowest_free_ids[name] = id
+        for attribute in INDEXED_BY_TYPE.get(name, ()):
+            table = self.by_attribute[(name, attribute)]
+            if table is None:
+                continue
+            value = header._attributes.get(attribute)
+            sections = table[value]
+            _remove_identical(sections, section)
+            if not sections:
+                del table[value]
+        for field, getter in self.fields.get(name, ()):
+            table = self.by_attribute[(name, field)]
+            if table is None:
+                continue
+            value = getter(section)
+            try:
+                sections = table[value]
+                _remove_identical(sections, section)
+            except (KeyError, TypeError, ValueError):
+                # The value changed in place since it was indexed
+                self.by_attribute[(name, field)] = None
+                continue
+            if not sections:
+                del table[value]
+
+    def replace_type(self, name: str, sections: Sequence[GDSection]) -> None:
+        """Replace all of the sections of a type"""
+        self.size -= len(self.by_type.pop(name, ()))
+        self._max_ids.pop(name, None)
+        self._lowest_free_ids.pop(name, None)
+        for attribute in INDEXED_BY_TYPE.get(name, ()):
+            self.by_attribute[(name, attribute)] = {}
+        for field, _ in self.fields.get(name, ()):
+            self.by_attribute[(name, field)] = {}
+        for section in sections:
+            self.append(section)
+
+    def candidates(self, name: str, constraints: Mapping[str, Any]) -> List[GDSection]:
+        """
+        The sections of a type that could match the constraints of GDFile.find_all
+
+        Uses the smallest table of sections with the same value for one of the
+        constrained attributes. The caller must still check the constraints.
+        """
+        best = self.by_type.get(name, [])
+        for attribute, value in constraints.items():
+            if attribute not in INDEXED_BY_TYPE.get(name, ()):
+                # Other fields don't compare the header attributes like find_all
+                continue
+            table = self.by_attribute.get((name, attribute))
+            if table is None:
+                continue
+            try:
+                sections = table.get(value, [])
+            except TypeError:
+                continue
+            if len(sections) < len(best):
+                best = sections
+        return best
+
+    def used_ids(self, name: str) -> Collection[Any]:
+        """The ids of the resources of a type"""
+        table = self.by_attribute[(name, "id")]
+        if table is not None:
+            return table.keys()
+        return [s.header._attributes.get("id") for s in self.by_type.get(name, ())]
+
+    def new_int_ids(self, name: str, count: int, reuse: bool = False) -> List[int]:
+        """
+        Pick integer ids for new resources of a type
+
+        These are one more than the highest id and up, or the lowest unused ids if
+        reuse is True.
+        """
+        if not reuse:
+            if name not in self._max_ids:
+                self._max_ids[name] = max(
+                    (id for id in self.used_ids(name) if _is_int(id)), default=0
+                )
+            start = self._max_ids[name] + 1
+            return list(range(start, start + count))
+        used = self.used_ids(name)
+        ids: List[int] = []
+        id = self._lowest_free_ids.get(name, 1)
+        while len(ids) < count:
+            if id not in used:
+                ids.append(id)
+            id += 1
+        if ids:
+            self._lowest_free_ids[name] = ids[0]
+        return ids
+
+    def new_string_id(self, name: str, prefix: str, taken: Set[str]) -> str:
+        """
+        Pick a Godot 4 style id like "1_a2b3c" for a new resource of a type
+
+        The id isn't used by any resource of the type or in taken.
+        """
+        used = self.used_ids(name)
+        while True:
+            id = prefix + "_" + "".join(secrets.choice(_ID_CHARS) for _ in range(5))
+            if id not in used and id not in taken:
+                return id
+
+
+def field_getter(field: str) -> FieldGetter:
+    """
+    Compile a function that returns the value of a field of a section
+
+    Fields are header attributes like "type", which are read through the section's
+    properties like GDNodeSection.instance where it has them, or "props__" and a
+    property name. Each further part gets a key of a dict, an item of a list or an
+    attribute of an object, like "props__position__x". The function returns MISSING
+    if there is no such value.
+    """
+    parts = field.split("__")
+    if parts[0] == "props":
+        if len(parts) < 2 or not parts[1]:
+            raise ValueError("Missing property name in %r" % field)
+        get = _property_getter(parts[1])
+        parts = parts[2:]
+    else:
+        get = _header_getter(parts[0])
+        parts = parts[1:]
+    for part in parts:
+        get = _item_getter(get, part)
+    return get
+
+
+def _header_getter(attribute: str) -> FieldGetter:
+    # Section class -> the property for the attribute, if it has one
+    accessors: Dict[type, Optional[property]] = {}
+
+    def get(section: GDSection) -> Any:
+        cls = type(section)
+        try:
+            accessor = accessors[cls]
+        except KeyError:
+            accessor = getattr(cls, attribute, None)
+            if not isinstance(accessor, property):
+                accessor = None
+            accessors[cls] = accessor
+        if accessor is None:
+            return section.header._attributes.get(attribute)
+        try:
+            return accessor.fget(section)  # type: ignore[misc]
+        except KeyError:
+            return None
+
+    return get
+
+
+def _property_getter(key: str) -> FieldGetter:
+    def get(section: GDSection) -> Any:
+        # Don't count reading the value as a change to the section
+        properties = section._properties
+        try:
+            if isinstance(properties, LazyProperties):
+                return properties.decode(key)
+            return properties[key]
+        except KeyError:
+            return MISSING
+
+    return get
+
+
+def _item_getter(get_container: FieldGetter, part: str) -> FieldGetter:
+    index = int(part) if part.isdigit() else None
+
+    def get(section: GDSection) -> Any:
+        container = get_container(section)
+        if container is MISSING or container is None:
+            return MISSING
+        if isinstance(container, dict):
+            return container.get(part, MISSING)
+        if index is not None:
+            try:
+                return container[index]
+            except (IndexError, KeyError, TypeError):
+                return MISSING
+        return getattr(container, part, MISSING)
+
+    return get
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _remove_identical(sections: List[GDSection], section: GDSection) -> None:
+    """Remove a section by identity instead of equality, which is much slower"""
+    for i, s in enumerate(sections):
+        if s is section:
+            del sections[i]
+            return
+    raise ValueError("Section is not in the index")
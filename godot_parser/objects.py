@@ -1,9 +1,10 @@
 """ Wrappers for Godot's non-primitive object types """
 
+from array import array
 from functools import partial
-from typing import TypeVar
+from typing import Any, Iterator, List, TypeVar, Union
 
-from .util import stringify_object
+from .util import register_writer, write_value
 
 __all__ = [
     "GDObject",
@@ -13,6 +14,22 @@ __all__ = [
     "NodePath",
     "ExtResource",
     "SubResource",
+    "PackedArray",
+    "PoolRealArray",
+    "PoolIntArray",
+    "PoolByteArray",
+    "PoolVector2Array",
+    "PoolVector3Array",
+    "PoolColorArray",
+    "PackedFloat32Array",
+    "PackedFloat64Array",
+    "PackedInt32Array",
+    "PackedInt64Array",
+    "PackedByteArray",
+    "PackedVector2Array",
+    "PackedVector3Array",
+    "PackedVector4Array",
+    "PackedColorArray",
 ]
 
 GD_OBJECT_REGISTRY = {}
@@ -53,13 +70,20 @@ class GDObject(metaclass=GDObjectMeta):
         type_name = parse_result[0]
         args = parse_result[1:] if len(parse_result) > 1 else []
         factory = GD_OBJECT_REGISTRY.get(type_name, partial(GDObject, type_name))
+        if isinstance(factory, type) and issubclass(factory, PackedArray):
+            try:
+                values = array(factory.typecode, args)
+            except (TypeError, OverflowError):
+                # Not numbers that fit in the array, like the base64 data of a
+                # PackedByteArray, so keep the arguments as they are
+                return GDObject(type_name, *args)
+            return factory.from_array(values)
         return factory(*args)
 
     def __str__(self) -> str:
-        return "%s( %s )" % (
-            self.name,
-            ", ".join([stringify_object(v) for v in self.args]),
-        )
+        out: List[str] = []
+        _write_object(self, out)
+        return "".join(out)
 
     def __repr__(self) -> str:
         return self.__str__()
@@ -73,6 +97,25 @@ class GDObject(metaclass=GDObjectMeta):
         return not self.__eq__(other)
 
 
+def _write_object(value: GDObject, out: List[str]) -> None:
+    out.append(value.name + "( ")
+    first = True
+    for arg in value.args:
+        if first:
+            first = False
+        else:
+            out.append(", ")
+        # Most arguments are numbers, so skip the dispatch for them
+        if type(arg) is int or type(arg) is float:
+            out.append(str(arg))
+        else:
+            write_value(arg, out)
+    out.append(" )")
+
+
+register_writer(GDObject, _write_object)
+
+
 class Vector2(GDObject):
     def __init__(self, x: float, y: float) -> None:
         super().__init__("Vector2", x, y)
@@ -219,30 +262,171 @@ class NodePath(GDObject):
 
 
 class ExtResource(GDObject):
-    def __init__(self, id: int) -> None:
+    def __init__(self, id: Union[int, str]) -> None:
         super().__init__("ExtResource", id)
 
     @property
-    def id(self) -> int:
+    def id(self) -> Union[int, str]:
         """Getter for id"""
         return self.args[0]
 
     @id.setter
-    def id(self, id: int) -> None:
+    def id(self, id: Union[int, str]) -> None:
         """Setter for id"""
         self.args[0] = id
 
 
 class SubResource(GDObject):
-    def __init__(self, id: int) -> None:
+    def __init__(self, id: Union[int, str]) -> None:
         super().__init__("SubResource", id)
 
     @property
-    def id(self) -> int:
+    def id(self) -> Union[int, str]:
         """Getter for id"""
         return self.args[0]
 
     @id.setter
-    def id(self, id: int) -> None:
+    def id(self, id: Union[int, str]) -> None:
         """Setter for id"""
         self.args[0] = id
+
+
+def _format_floats(values: array) -> str:
+    # Godot writes whole numbers in packed arrays without a decimal point. repr()
+    # only ends a number with ".0" if it is whole, so strip that from every number.
+    text = ", ".join(map(repr, values)) + ","
+    return text.replace(".0,", ",")[:-1]
+
+
+class PackedArray(GDObject):
+    """
+    Base class for Godot's packed arrays of numbers
+
+    The values are stored flattened in an array.array, so a PackedVector2Array of N
+    points holds 2 * N floats. Floats are always stored as doubles so that writing the
+    file back out does not lose precision.
+    """
+
+    typecode = "d"
+    width = 1
+
+    def __init__(self, *values: float) -> None:
+        super().__init__(type(self).__name__)
+        self.args = array(self.typecode, values)  # type: ignore
+
+    @classmethod
+    def from_array(cls, values: array) -> "PackedArray":
+        """Wrap an array.array of flattened values without copying it"""
+        obj = cls.__new__(cls)
+        obj.name = cls.__name__
+        obj.args = values  # type: ignore
+        return obj
+
+    @classmethod
+    def from_text(cls, text: str) -> "PackedArray":
+        """Convert a comma-separated run of numbers in one pass"""
+        if not text.strip():
+            return cls()
+        convert = float if cls.typecode == "d" else int
+        return cls.from_array(array(cls.typecode, map(convert, text.split(","))))
+
+    @property
+    def values(self) -> array:
+        """The flattened values"""
+        return self.args  # type: ignore
+
+    def to_numpy(self) -> Any:
+        """
+        Get a NumPy view of the values that shares memory with this object
+
+        Arrays of vectors or colors have shape (len(self), width). Requires numpy.
+        """
+        import numpy  # pylint: disable=import-outside-toplevel
+
+        view = numpy.frombuffer(self.args, dtype=self.typecode)
+        if self.width > 1:
+            view = view.reshape(-1, self.width)
+        return view
+
+    def __len__(self) -> int:
+        return len(self.args) // self.width
+
+    def __iter__(self) -> Iterator[Any]:
+        if self.width == 1:
+            return iter(self.args)
+        return (
+            tuple(self.args[i : i + self.width])
+            for i in range(0, len(self.args), self.width)
+        )
+
+    def __str__(self) -> str:
+        if self.typecode == "d":
+            text = _format_floats(self.args)  # type: ignore
+        else:
+            text = ", ".join(map(str, self.args))
+        return "%s( %s )" % (self.name, text)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, GDObject):
+            return False
+        return self.name == other.name and list(self.args) == list(other.args)
+
+
+class PoolRealArray(PackedArray):
+    pass
+
+
+class PoolIntArray(PackedArray):
+    typecode = "i"
+
+
+class PoolByteArray(PackedArray):
+    typecode = "B"
+
+
+class PoolVector2Array(PackedArray):
+    width = 2
+
+
+class PoolVector3Array(PackedArray):
+    width = 3
+
+
+class PoolColorArray(PackedArray):
+    width = 4
+
+
+class PackedFloat32Array(PackedArray):
+    pass
+
+
+class PackedFloat64Array(PackedArray):
+    pass
+
+
+class PackedInt32Array(PackedArray):
+    typecode = "i"
+
+
+class PackedInt64Array(PackedArray):
+    typecode = "q"
+
+
+class PackedByteArray(PackedArray):
+    typecode = "B"
+
+
+class PackedVector2Array(PackedArray):
+    width = 2
+
+
+class PackedVector3Array(PackedArray):
+    width = 3
+
+
+class PackedVector4Array(PackedArray):
+    width = 4
+
+
+class PackedColorArray(PackedArray):
+    width = 4
@@ -0,0 +1,610 @@
+""" Hand-written tokenizer and recursive-descent parser for the GD file format
+
+This is a faster alternative to the pyparsing grammar in structure.py and values.py.
+It builds exactly the same GDSection, GDSectionHeader and GDObject structures, and the
+pyparsing grammar remains the reference implementation.
+
+The only intentional difference is that tabs inside string literals are preserved.
+pyparsing expands tabs in the whole input before parsing, which rewrites the
+indentation of built-in scripts.
+"""
+
+import io
+import mmap
+import os
+import re
+from typing import (
+    IO,
+    Any,
+    Collection,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from .objects import GD_OBJECT_REGISTRY, GDObject, PackedArray
+from .sections import GDSection, GDSectionHeader, LazyProperties
+from .util import is_binary_stream
+
+__all__ = ["GodotParseException", "iter_sections", "reparse_sections"]
+
+_WHITESPACE = re.compile(r"[ \t\r\n]*")
+_LINE_END = re.compile(r"[ \t\r]*(?:\n|\Z)")
+_STRING = re.compile(r'"((?:\\.|[^"\\])*)"', re.S)
+_KEY_STRING = re.compile(r'"((?:\\.|[^"\n\r\\])*)"')
+_KEY = re.compile(r"[A-Za-z0-9_/:]+")
+_VAR = re.compile(r"[A-Za-z0-9_]+")
+_WORD = re.compile(r"[A-Za-z][A-Za-z0-9\[\]]*")
+_KEYWORD = re.compile(r"(?:true|false|null)(?![A-Za-z0-9_$])")
+_NUMBER = re.compile(r"[+-]?(?:(?:\d+\.\d*|\.\d+)(?:[eE][+-]?\d+)?|\d+([eE][+-]?\d+)?)")
+_NUMBER_RUN = re.compile(
+    r"\(\s*(%(number)s(?:\s*,\s*%(number)s)*)?\s*\)"
+    % {"number": r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?"}
+)
+_ESCAPE = re.compile(r"\\(.)", re.S)
+# Used to find section boundaries without parsing values
+_STRUCTURE = re.compile(r'"(?:\\.|[^"\\])*"|"|[\[\]{}()]', re.S)
+_STRING_END = re.compile(r'(?:\\.|[^"\\])*"', re.S)
+_SECTION_TYPE = re.compile(r"\s*\[\s*([A-Za-z0-9_]+)")
+_BUFFER_SECTION_TYPE = re.compile(rb"\s*\[\s*([A-Za-z0-9_]+)")
+_BUFFER_STRUCTURE = re.compile(
+    rb'"(?:\\.|[^"\\])*"|\n[ \t\r\n]*(?=\[)|[\[\]{}()]', re.S
+)
+_VALUE_STRUCTURE = re.compile(r'"(?:\\.|[^"\\])*"|"|[\[\]{}()]|\n', re.S)
+
+_ESCAPES = {"t": "\t", "n": "\n", "f": "\f", "r": "\r", "0": "\0"}
+_KEYWORDS = {"true": True, "false": False, "null": None}
+_NUMBER_START = frozenset("+-.0123456789")
+
+
+class GodotParseException(Exception):
+    """Thrown by the fast parser when the contents are not a valid Godot file"""
+
+    def __init__(self, msg: str, loc: int, lineno: int, col: int) -> None:
+        self.msg = msg
+        self.loc = loc
+        self.lineno = lineno
+        self.col = col
+        super().__init__(
+            "%s (at char %d), (line:%d, col:%d)" % (msg, loc, lineno, col)
+        )
+
+    def __reduce__(self):
+        return (type(self), (self.msg, self.loc, self.lineno, self.col))
+
+
+def _unescape(match: "re.Match[str]") -> str:
+    char = match.group(1)
+    return _ESCAPES.get(char, char)
+
+
+class Parser(object):
+    """
+    Parses Godot file contents starting at a position
+
+    Each parse_* method skips leading whitespace, consumes one grammar element and
+    leaves self.pos just past it.
+    """
+
+    def __init__(self, contents: str, pos: int = 0, lazy: bool = False) -> None:
+        self.contents = contents
+        self.pos = pos
+        self.lazy = lazy
+
+    def error(self, expected: str) -> GodotParseException:
+        found = self.contents[self.pos : self.pos + 1]
+        found = repr(found) if found else "end of text"
+        return GodotParseException(
+            "Expected %s, found %s" % (expected, found),
+            self.pos,
+            self.contents.count("\n", 0, self.pos) + 1,
+            self.pos - self.contents.rfind("\n", 0, self.pos),
+        )
+
+    def skip_whitespace(self) -> int:
+        self.pos = _WHITESPACE.match(self.contents, self.pos).end()  # type: ignore
+        return self.pos
+
+    def at_end(self) -> bool:
+        return self.skip_whitespace() >= len(self.contents)
+
+    def expect(self, char: str) -> None:
+        pos = self.skip_whitespace()
+        if self.contents.startswith(char, pos):
+            self.pos = pos + 1
+        else:
+            raise self.error("'%s'" % char)
+
+    def expect_line_end(self) -> None:
+        match = _LINE_END.match(self.contents, self.pos)
+        if match is None:
+            self.skip_whitespace()
+            raise self.error("end of line")
+        self.pos = match.end()
+
+    def _match(self, regex: "re.Pattern[str]", expected: str) -> "re.Match[str]":
+        match = regex.match(self.contents, self.skip_whitespace())
+        if match is None:
+            raise self.error(expected)
+        self.pos = match.end()
+        return match
+
+    def _string(self, regex: "re.Pattern[str]", expected: str) -> str:
+        raw = self._match(regex, expected).group(1)
+        if "\\" in raw:
+            return _ESCAPE.sub(_unescape, raw)
+        return raw
+
+    def parse_file(self) -> List[GDSection]:
+        """Parse all sections until the end of the contents"""
+        sections = [self.parse_section()]
+        while not self.at_end():
+            sections.append(self.parse_section())
+        return sections
+
+    def parse_section(self) -> GDSection:
+        """Parse a section header and all of its properties"""
+        start = self.skip_whitespace()
+        parse_result: List[Any] = [self.parse_section_header()]
+        while not self.at_end() and self.contents[self.pos] != "[":
+            parse_result.append(self.parse_section_entry())
+        if self.lazy:
+            section = GDSection.from_parser(parse_result[:1])
+            section.properties = LazyProperties(parse_result[1:])
+        else:
+            section = GDSection.from_parser(parse_result)
+        section.source = (self.contents, start, self.pos)
+        return section
+
+    def parse_section_header(self) -> GDSectionHeader:
+        """Parse a line like [node name="Sprite" type="Sprite"]"""
+        self.expect("[")
+        parse_result: List[Any] = [self._match(_VAR, "section type").group()]
+        while self.skip_whitespace() < len(self.contents) and (
+            self.contents[self.pos] != "]"
+        ):
+            name = self._match(_VAR, "attribute name").group()
+            self.expect("=")
+            parse_result.append((name, self.parse_value()))
+        self.expect("]")
+        self.expect_line_end()
+        return GDSectionHeader.from_parser(parse_result)
+
+    def parse_section_entry(self) -> tuple:
+        """Parse a property line like texture = ExtResource( 1 )"""
+        pos = self.skip_whitespace()
+        if self.contents.startswith('"', pos):
+            key = self._string(_KEY_STRING, "key")
+        else:
+            key = self._match(_KEY, "key").group()
+        self.expect("=")
+        value = self._skip_value() if self.lazy else self.parse_value()
+        self.expect_line_end()
+        return (key, value)
+
+    def _skip_value(self) -> str:
+        """Find the end of a value without decoding it and return its source text"""
+        start = self.skip_whitespace()
+        end = len(self.contents)
+        depth = 0
+        for match in _VALUE_STRUCTURE.finditer(self.contents, start):
+            token = match.group()
+            if token == "\n":
+                if depth == 0:
+                    end = match.start()
+                    break
+            elif token == '"':
+                self.pos = match.start()
+                raise self.error("closing quote")
+            elif token[0] == '"':
+                continue
+            elif token in "[{(":
+                depth += 1
+            else:
+                depth -= 1
+        self.pos = end
+        text = self.contents[start:end].rstrip()
+        if not text:
+            raise self.error("value")
+        return text
+
+    def parse_value(self) -> Any:
+        """Parse any value that can appear in a property or header attribute"""
+        pos = self.skip_whitespace()
+        char = self.contents[pos : pos + 1]
+        if char == '"':
+            return self._string(_STRING, "string")
+        if char == "[":
+            return self._parse_list()
+        if char == "{":
+            return self._parse_dict()
+        if char in _NUMBER_START:
+            return self._parse_number()
+        if char in ("t", "f", "n"):
+            match = _KEYWORD.match(self.contents, pos)
+            if match is not None:
+                self.pos = match.end()
+                return _KEYWORDS[match.group()]
+        return self._parse_object()
+
+    def _parse_number(self) -> Any:
+        match = self._match(_NUMBER, "number")
+        text = match.group()
+        if "." in text or match.group(1):
+            return float(text)
+        return int(text)
+
+    def _parse_list(self) -> List[Any]:
+        # [ 1, 2 ] or [ 1, 2, ]
+        self.expect("[")
+        values: List[Any] = []
+        if self._peek() == ",":
+            self.pos += 1
+            self.expect("]")
+            return values
+        while self._peek() != "]":
+            values.append(self.parse_value())
+            if self._peek() != ",":
+                break
+            self.pos += 1
+        self.expect("]")
+        return values
+
+    def _parse_dict(self) -> dict:
+        self.expect("{")
+        values = {}
+        if self._peek() != "}":
+            while True:
+                key = self._string(_KEY_STRING, "key")
+                self.expect(":")
+                values[key] = self.parse_value()
+                if self._peek() != ",":
+                    break
+                self.pos += 1
+        self.expect("}")
+        return values
+
+    def _parse_object(self) -> Any:
+        # Vector2( 1, 2 ) or Array[int]([ 1, 2 ])
+        name = self._match(_WORD, "value").group()
+        factory = GD_OBJECT_REGISTRY.get(name)
+        if factory is not None and issubclass(factory, PackedArray):
+            packed = self._parse_packed_array(factory)
+            if packed is not None:
+                return packed
+        self.expect("(")
+        args: List[Any] = []
+        if self._peek() != ")":
+            args.append(self.parse_value())
+            while self._peek() == ",":
+                self.pos += 1
+                args.append(self.parse_value())
+        self.expect(")")
+        if args and "[" not in name:
+            return GDObject.from_parser([name] + args)
+        # Handles constructs like Array[Object](...)
+        return (name, *args)
+
+    def _parse_packed_array(self, factory: type) -> Optional[PackedArray]:
+        """Convert a whole run of numbers at once, or return None to fall back"""
+        match = _NUMBER_RUN.match(self.contents, self.skip_whitespace())
+        if match is None:
+            return None
+        try:
+            packed = factory.from_text(match.group(1) or "")
+        except (ValueError, OverflowError):
+            return None
+        self.pos = match.end()
+        return packed
+
+    def _peek(self) -> Optional[str]:
+        pos = self.skip_whitespace()
+        return self.contents[pos] if pos < len(self.contents) else None
+
+
+def parse_sections(contents: str, lazy: bool = False) -> List[GDSection]:
+    """
+    Parse the contents of a Godot file into a list of sections
+
+    If lazy is True, property values are only decoded when they are first accessed
+    (see LazyProperties).
+    """
+    return Parser(contents, lazy=lazy).parse_file()
+
+
+def reparse_sections(
+    sections: Sequence[GDSection],
+    contents: str,
+    offset: int,
+    removed: int,
+    inserted: str,
+) -> List[GDSection]:
+    """
+    Re-parse sections after replacing contents[offset:offset + removed] with inserted
+
+    sections must have been parsed from contents by the fast parser and not changed
+    since (see GDSection.unmodified_source). Only the sections that overlap the edit
+    are parsed again; the other section objects are reused and their source moved to
+    the new text. If the sections don't come from contents, or the edit changes how
+    the following sections parse, the whole new text is parsed instead.
+    """
+    new_contents = contents[:offset] + inserted + contents[offset + removed :]
+    if not sections or sections[0].unmodified_source is None:
+        return parse_sections(new_contents)
+    text = sections[0].unmodified_source[0]
+    if text is not contents and text != contents:
+        return parse_sections(new_contents)
+    spans: List[Tuple[int, int]] = []
+    for section in sections:
+        source = section.unmodified_source
+        if source is None or source[0] is not text:
+            return parse_sections(new_contents)
+        spans.append((source[1], source[2]))
+
+    # Sections that end at the edit are included too, because the edit may extend
+    # them or remove the header of the section after them
+    edit_end = offset + removed
+    lo = 0
+    while lo < len(spans) - 1 and spans[lo][1] < offset:
+        lo += 1
+    hi = lo
+    while hi < len(spans) - 1 and spans[hi + 1][0] <= edit_end:
+        hi += 1
+    delta = len(inserted) - removed
+    region_end = spans[hi][1] + delta
+
+    parser = Parser(new_contents, 0 if lo == 0 else spans[lo][0])
+    reparsed = []
+    while parser.skip_whitespace() < region_end:
+        reparsed.append(parser.parse_section())
+    if parser.pos != region_end:
+        # The edit spilled over into the next section, e.g. an unclosed string
+        return parse_sections(new_contents)
+    result = list(sections[:lo]) + reparsed + list(sections[hi + 1 :])
+    if not result:
+        return parse_sections(new_contents)
+    for section in sections[:lo]:
+        _, start, end = section.source
+        section.source = (new_contents, start, end)
+    for section in sections[hi + 1 :]:
+        _, start, end = section.source
+        section.source = (new_contents, start + delta, end + delta)
+    return result
+
+
+def parse_value(contents: str) -> Any:
+    """Parse the text of a single value"""
+    parser = Parser(contents)
+    value = parser.parse_value()
+    if not parser.at_end():
+        raise parser.error("end of value")
+    return value
+
+
+class _SectionSplitter(object):
+    """Tracks strings and brackets across lines to find where each section starts"""
+
+    def __init__(self) -> None:
+        self.in_string = False
+        self.depth = 0
+
+    def starts_section(self, line: str) -> bool:
+        """Consume a line and return True if it begins a new section"""
+        starts = (
+            not self.in_string and self.depth == 0 and line.lstrip().startswith("[")
+        )
+        pos = 0
+        if self.in_string:
+            match = _STRING_END.match(line)
+            if match is None:
+                return False
+            pos = match.end()
+            self.in_string = False
+        for match in _STRUCTURE.finditer(line, pos):
+            token = match.group()
+            if token == '"':
+                # Unterminated string continues onto the next line
+                self.in_string = True
+                break
+            elif token[0] == '"':
+                continue
+            elif token in "[{(":
+                self.depth += 1
+            else:
+                self.depth -= 1
+        return starts
+
+
+def _parse_chunk(chunk: str, loc: int, lineno: int, lazy: bool) -> GDSection:
+    parser = Parser(chunk, lazy=lazy)
+    try:
+        section = parser.parse_section()
+        if not parser.at_end():
+            raise parser.error("end of section")
+    except GodotParseException as e:
+        raise GodotParseException(
+            e.msg, loc + e.loc, lineno + e.lineno - 1, e.col
+        ) from None
+    return section
+
+
+Buffer = Union[bytes, bytearray, mmap.mmap]
+
+
+def iter_sections(
+    source: Union[str, os.PathLike, Buffer, IO[bytes], Iterable[str]],
+    lazy: bool = False,
+    section_types: Optional[Collection[str]] = None,
+    stop_at: Optional[Collection[str]] = None,
+) -> Iterator[GDSection]:
+    """
+    Parse a Godot file one section at a time
+
+    source may be a file path, an iterable of lines such as a file opened in text
+    mode, a file opened in binary mode, or a UTF-8 encoded buffer such as a mmap.
+    Binary files are read as UTF-8. Only the section being parsed is
+    decoded and held in memory, so this can scan resource files that are too large to
+    load with GDFile.load. When parsing a buffer, errors report byte offsets.
+
+    If section_types is passed, sections of other types are skipped without being
+    parsed. If stop_at is passed, reading stops at the first section of one of those
+    types.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(os.fspath(source), "r", encoding="utf-8") as ifile:
+            yield from _iter_sections(ifile, lazy, section_types, stop_at)
+    elif isinstance(source, (bytes, bytearray, mmap.mmap)):
+        yield from _iter_buffer_sections(source, lazy, section_types, stop_at)
+    elif is_binary_stream(source):
+        text = io.TextIOWrapper(source, encoding="utf-8")  # type: ignore[arg-type]
+        try:
+            yield from _iter_sections(text, lazy, section_types, stop_at)
+        finally:
+            # Leave the caller's file open
+            text.detach()
+    elif isinstance(source, Iterable):
+        yield from _iter_sections(source, lazy, section_types, stop_at)
+    else:
+        raise TypeError(
+            "Expected a path, a buffer, a file or an iterable of lines, not %s"
+            % type(source).__name__
+        )
+
+
+def _iter_buffer_chunks(buffer: Buffer) -> Iterator[Tuple[int, int]]:
+    """Yield the start and end offsets of each section in a buffer"""
+    start = depth = 0
+    has_content = False
+    for match in _BUFFER_STRUCTURE.finditer(buffer):
+        token = match.group()
+        if token[:1] == b'"':
+            continue
+        elif token[:1] == b"\n":
+            if depth != 0:
+                continue
+            end = match.end()
+            if has_content or buffer[start:end].strip():
+                yield start, end
+                start = end
+                has_content = True
+        elif token in b"[{(":
+            depth += 1
+        else:
+            depth -= 1
+    yield start, len(buffer)
+
+
+def _shift_error(
+    e: GodotParseException, buffer: Buffer, start: int, loc: int
+) -> GodotParseException:
+    """Move an error in a slice of buffer starting at start to the whole buffer"""
+    return GodotParseException(
+        e.msg, start + loc, buffer[:start].count(b"\n") + e.lineno, e.col
+    )
+
+
+def _iter_buffer_sections(
+    buffer: Buffer,
+    lazy: bool,
+    section_types: Optional[Collection[str]],
+    stop_at: Optional[Collection[str]],
+) -> Iterator[GDSection]:
+    for start, end in _iter_buffer_chunks(buffer):
+        match = _BUFFER_SECTION_TYPE.match(buffer, start)
+        section_type = match.group(1).decode() if match is not None else None
+        if stop_at is not None and section_type in stop_at:
+            return
+        if section_types is not None and section_type is not None:
+            if section_type not in section_types:
+                continue
+        chunk = buffer[start:end].decode("utf-8")
+        try:
+            section = _parse_chunk(chunk, 0, 1, lazy)
+        except GodotParseException as e:
+            loc = len(chunk[: e.loc].encode("utf-8"))
+            raise _shift_error(e, buffer, start, loc) from None
+        yield section
+
+
+def _parse_batch(batch: bytes, lazy: bool) -> List[GDSection]:
+    return list(_iter_buffer_sections(batch, lazy, None, None))
+
+
+def parse_buffer_parallel(
+    buffer: Buffer, workers: int, lazy: bool = False
+) -> List[GDSection]:
+    """
+    Parse a UTF-8 encoded buffer with a pool of worker processes
+
+    The buffer is split at section boundaries into batches that are parsed
+    concurrently, and the sections are returned in file order.
+    """
+    chunks = list(_iter_buffer_chunks(buffer))
+    if workers <= 1 or len(chunks) <= 1:
+        return _parse_batch(buffer, lazy)
+    # A few batches per worker keeps them all busy without pickling each section
+    # separately
+    batch_size = -(-len(chunks) // (workers * 4))
+    batches = [
+        (chunks[i][0], chunks[min(i + batch_size, len(chunks)) - 1][1])
+        for i in range(0, len(chunks), batch_size)
+    ]
+    # Importing concurrent.futures.process is slow, so only do it when needed
+    from concurrent.futures import (  # pylint: disable=import-outside-toplevel
+        ProcessPoolExecutor,
+    )
+
+    sections: List[GDSection] = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_parse_batch, buffer[start:end], lazy)
+            for start, end in batches
+        ]
+        for (start, _), future in zip(batches, futures):
+            try:
+                sections.extend(future.result())
+            except GodotParseException as e:
+                raise _shift_error(e, buffer, start, e.loc) from None
+    return sections
+
+
+def _iter_sections(
+    lines: Iterable[str],
+    lazy: bool,
+    section_types: Optional[Collection[str]],
+    stop_at: Optional[Collection[str]],
+) -> Iterator[GDSection]:
+    splitter = _SectionSplitter()
+    chunk: List[str] = []
+    keep = True
+    has_content = False
+    loc = lineno = 0
+    chunk_loc, chunk_lineno = 0, 1
+    for line in lines:
+        lineno += 1
+        if splitter.starts_section(line):
+            if has_content:
+                if keep:
+                    yield _parse_chunk("".join(chunk), chunk_loc, chunk_lineno, lazy)
+                chunk = []
+                chunk_loc, chunk_lineno = loc, lineno
+            match = _SECTION_TYPE.match(line)
+            section_type = match.group(1) if match is not None else None
+            if stop_at is not None and section_type in stop_at:
+                return
+            # Malformed headers are kept so that parsing reports the error
+            keep = (
+                section_types is None
+                or section_type is None
+                or section_type in section_types
+            )
+        if keep:
+            chunk.append(line)
+        has_content = has_content or bool(line.strip())
+        loc += len(line)
+    if keep:
+        yield _parse_chunk("".join(chunk), chunk_loc, chunk_lineno, lazy)
@@ -0,0 +1,216 @@
+""" Queries over the sections of a file """
+import copy
+import fnmatch
+import operator
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .files import GDFile
+from .index import MISSING, field_getter
+from .sections import GDSection, _is_mutable
+
+__all__ = ["Query"]
+
+Predicate = Callable[[GDSection], bool]
+
+# Operator name -> function of the field value and the argument
+OPERATORS: Dict[str, Callable[[Any, Any], Any]] = {
+    "exact": operator.eq,
+    "ne": operator.ne,
+    "in": lambda value, arg: value in arg,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "range": lambda value, arg: arg[0] <= value <= arg[1],
+    "contains": lambda value, arg: arg in value,
+    "glob": lambda value, arg: isinstance(value, str)
+    and fnmatch.fnmatchcase(value, arg),
+}
+
+
+class Query(object):
+    """
+    A query over the sections of a file, created with GDFile.query()
+
+    where() returns a new query that only matches the sections that also pass some
+    lookups, which are compiled once and can be run many times::
+
+        areas = scene.query("node").where(
+            type__in={"Area2D", "Area3D"}, props__collision_layer=5
+        )
+        for node in areas:
+            print(node.name)
+        areas.update(props__monitoring=False)
+
+    A lookup is a field and an optional operator, separated by "__". Fields are
+    header attributes like "type" or "props__" and a property name, and may be
+    followed by dict keys, list indexes or attributes, like "props__position__x".
+    The operators are exact (the default), ne, in, lt, lte, gt, gte, range (an
+    inclusive (low, high) pair), contains, glob (fnmatch patterns) and isnull.
+    Sections without a field never match, except with isnull. You can also pass
+    functions of a section that return True for the sections to keep. Use these for
+    property names that contain "__".
+
+    Lookups for one value or a few values of a field (exact and in) use the file's
+    index for that field if there is one. Sections are indexed by resource id and
+    path and by node name and parent, and GDFile.add_index() adds more.
+    """
+
+    def __init__(self, file: GDFile, section_name: Optional[str] = None) -> None:
+        self.file = file
+        self.section_name = section_name
+        # (field, operator, argument) of each lookup
+        self._lookups: List[Tuple[str, str, Any]] = []
+        self._predicates: List[Predicate] = []
+
+    def where(self, *predicates: Predicate, **lookups: Any) -> "Query":
+        """Return a query for the sections that also pass these lookups"""
+        query = Query(self.file, self.section_name)
+        query._lookups = list(self._lookups)
+        query._predicates = self._predicates + list(predicates)
+        for key, arg in lookups.items():
+            field, op, arg = _parse_lookup(key, arg)
+            query._lookups.append((field, op, arg))
+            query._predicates.append(_compile_lookup(field, op, arg))
+        return query
+
+    def __iter__(self) -> Iterator[GDSection]:
+        predicates = self._predicates
+        for section in self._candidates():
+            for predicate in predicates:
+                if not predicate(section):
+                    break
+            else:
+                yield section
+
+    def all(self) -> List[GDSection]:
+        """All of the matching sections, in file order"""
+        return list(self)
+
+    def first(self) -> Optional[GDSection]:
+        """The first matching section, or None"""
+        for section in self:
+            return section
+        return None
+
+    def count(self) -> int:
+        """The number of matching sections"""
+        return sum(1 for _ in self)
+
+    def update(self, **values: Any) -> int:
+        """
+        Set fields of all of the matching sections and return how many there were
+
+        Fields are header attributes, which are set through the section's properties
+        where it has them, or "props__" and a property name. Setting a header
+        attribute without a property to None removes it. Each section gets its own
+        copy of values like lists and GDObjects.
+        """
+        setters = [_compile_setter(field, value) for field, value in values.items()]
+        sections = self.all()
+        for section in sections:
+            for setter in setters:
+                setter(section)
+        return len(sections)
+
+    def _candidates(self) -> List[GDSection]:
+        """A copy of the sections that could match, using the smallest index table"""
+        file = self.file
+        if self.section_name is None:
+            return list(file._sections)
+        index = file._get_index()
+        of_type = index.by_type.get(self.section_name, [])
+        best = of_type
+        for field, op, arg in self._lookups:
+            if op not in ("exact", "in"):
+                continue
+            table = index.by_attribute.get((self.section_name, field))
+            if table is None:
+                continue
+            try:
+                if op == "exact":
+                    sections = table.get(arg, [])
+                else:
+                    matches = [table[value] for value in arg if value in table]
+                    if len(matches) <= 1:
+                        sections = matches[0] if matches else []
+                    else:
+                        # Put the sections with any of the values in file order
+                        ids = {id(s) for sections in matches for s in sections}
+                        if len(ids) >= len(best):
+                            continue
+                        sections = [s for s in of_type if id(s) in ids]
+            except TypeError:
+                # Unhashable argument
+                continue
+            if len(sections) < len(best):
+                best = sections
+        return list(best)
+
+    def __repr__(self) -> str:
+        return "Query(%r, %r)" % (self.section_name, self._lookups)
+
+
+def _parse_lookup(key: str, arg: Any) -> Tuple[str, str, Any]:
+    field, _, op = key.rpartition("__")
+    if not field or (op not in OPERATORS and op != "isnull"):
+        field, op = key, "exact"
+    if op == "in":
+        try:
+            arg = frozenset(arg)
+        except TypeError:
+            arg = tuple(arg)
+    return field, op, arg
+
+
+def _compile_lookup(field: str, op: str, arg: Any) -> Predicate:
+    get = field_getter(field)
+    if op == "isnull":
+        isnull = bool(arg)
+
+        def predicate(section: GDSection) -> bool:
+            value = get(section)
+            return (value is MISSING or value is None) == isnull
+
+        return predicate
+
+    test = OPERATORS[op]
+
+    def predicate(section: GDSection) -> bool:
+        value = get(section)
+        if value is MISSING:
+            return False
+        try:
+            return bool(test(value, arg))
+        except TypeError:
+            # e.g. comparing None to a number
+            return False
+
+    return predicate
+
+
+def _compile_setter(field: str, value: Any) -> Callable[[GDSection], None]:
+    parts = field.split("__")
+    if parts[0] == "props":
+        if len(parts) != 2 or not parts[1]:
+            raise ValueError("Cannot update %r; only whole properties" % field)
+        key = parts[1]
+
+        def set_property(section: GDSection) -> None:
+            section[key] = copy.deepcopy(value) if _is_mutable(value) else value
+
+        return set_property
+    if len(parts) != 1:
+        raise ValueError("Cannot update %r; only whole header attributes" % field)
+
+    def set_attribute(section: GDSection) -> None:
+        accessor = getattr(type(section), field, None)
+        new_value = copy.deepcopy(value) if _is_mutable(value) else value
+        if isinstance(accessor, property) and accessor.fset is not None:
+            accessor.fset(section, new_value)
+        elif new_value is None:
+            del section.header[field]
+        else:
+            section.header[field] = new_value
+
+    return set_attribute
@@ -1,10 +1,22 @@
 import re
 from collections import OrderedDict
-from typing import Any, List, Optional, Type, TypeVar
+from collections.abc import MutableMapping
+from typing import (
+    Any,
+    FrozenSet,
+    ItemsView,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
 from .objects import ExtResource, SubResource
-from .util import stringify_object
-from .values import value
+from .util import write_value
 
 __all__ = [
     "GDSectionHeader",
@@ -19,6 +31,32 @@ __all__ = [
 GD_SECTION_REGISTRY = {}
 
 
+_MISSING = object()
+
+# Incremented when an indexed attribute or property of a section in a GDFile
+# changes, so that the file knows to rebuild its indexes
+_index_generation = 0
+
+
+def index_generation() -> int:
+    return _index_generation
+
+
+def _invalidate_indexes() -> None:
+    global _index_generation  # pylint: disable=global-statement
+    _index_generation += 1
+
+
+def _is_mutable(value: Any) -> bool:
+    """True if changes to value could be made in place without going through setters"""
+    return not isinstance(value, (str, int, float, type(None)))
+
+
+def _is_same(old: Any, new: Any) -> bool:
+    """True if replacing old with new can't change how it is written out"""
+    return type(old) is type(new) and not _is_mutable(new) and old == new
+
+
 class GDSectionHeader(object):
     """
     Represents the header for a section
@@ -28,41 +66,94 @@ class GDSectionHeader(object):
         [node name="Sprite" type="Sprite" index="3"]
     """
 
+    # Set when the attributes may have changed since the header was parsed or
+    # written out
+    _touched = False
+    # Set for good once the attributes or a value that can be changed in place may
+    # be referenced from outside the header
+    _shared = False
+    # Set when the section has been added to a GDFile's indexes, along with the
+    # attributes and properties that the index uses (see index.py)
+    _indexed = False
+    _indexed_attributes: FrozenSet[str] = frozenset()
+    _indexed_properties: FrozenSet[str] = frozenset()
+
     def __init__(self, _name: str, **kwargs) -> None:
         self.name = _name
-        self.attributes = OrderedDict()
+        self._attributes: OrderedDict = OrderedDict()
         for k, v in kwargs.items():
-            self.attributes[k] = v
+            if _is_mutable(v):
+                self._shared = True
+            self._attributes[k] = v
+
+    @property
+    def attributes(self) -> OrderedDict:
+        # The caller may modify the attributes or their values in place
+        self._touched = self._shared = True
+        if self._indexed:
+            _invalidate_indexes()
+        return self._attributes
+
+    @attributes.setter
+    def attributes(self, attributes: OrderedDict) -> None:
+        self._touched = self._shared = True
+        if self._indexed:
+            _invalidate_indexes()
+        self._attributes = attributes
 
     def __getitem__(self, k: str) -> Any:
-        return self.attributes[k]
+        v = self._attributes[k]
+        if _is_mutable(v):
+            self._touched = self._shared = True
+            if k in self._indexed_attributes:
+                _invalidate_indexes()
+        return v
 
     def __setitem__(self, k: str, v: Any) -> None:
-        self.attributes[k] = v
+        if not _is_same(self._attributes.get(k, _MISSING), v):
+            self._touched = True
+            if _is_mutable(v):
+                self._shared = True
+            if k in self._indexed_attributes:
+                _invalidate_indexes()
+        self._attributes[k] = v
 
     def __delitem__(self, k: str):
         try:
-            del self.attributes[k]
+            del self._attributes[k]
         except KeyError:
             pass
+        else:
+            self._touched = True
+            if k in self._indexed_attributes:
+                _invalidate_indexes()
 
     def get(self, k: str, default: Any = None) -> Any:
-        return self.attributes.get(k, default)
+        v = self._attributes.get(k, default)
+        if _is_mutable(v):
+            self._touched = self._shared = True
+            if k in self._indexed_attributes:
+                _invalidate_indexes()
+        return v
 
     @classmethod
     def from_parser(cls: Type["GDSectionHeader"], parse_result) -> "GDSectionHeader":
         header = cls(parse_result[0])
         for attribute in parse_result[1:]:
-            header.attributes[attribute[0]] = attribute[1]
+            header._attributes[attribute[0]] = attribute[1]
         return header
 
+    def _serialize(self, out: List[str]) -> None:
+        out.append("[" + self.name)
+        for k, v in self._attributes.items():
+            out.append(" %s=" % (k,))
+            write_value(v, out)
+        out.append("]")
+
     def __str__(self) -> str:
-        attribute_str = ""
-        if self.attributes:
-            attribute_str = " " + " ".join(
-                ["%s=%s" % (k, stringify_object(v)) for k, v in self.attributes.items()]
-            )
-        return "[" + self.name + attribute_str + "]"
+        out: List[str] = []
+        self._serialize(out)
+        return "".join(out)
 
     def __repr__(self) -> str:
         return "GDSectionHeader(%s)" % self.__str__()
@@ -70,7 +161,7 @@ class GDSectionHeader(object):
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, GDSectionHeader):
             return False
-        return self.name == other.name and self.attributes == other.attributes
+        return self.name == other.name and self._attributes == other._attributes
 
     def __ne__(self, other: Any) -> bool:
         return not self.__eq__(other)
@@ -90,6 +181,76 @@ class GDSectionMeta(type):
 GDSectionType = TypeVar("GDSectionType", bound="GDSection")
 
 
+class RawValue(object):
+    """The undecoded source text of a property value"""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+    def __repr__(self) -> str:
+        return "RawValue(%s)" % self.text
+
+
+class LazyProperties(MutableMapping):
+    """
+    Section properties that are decoded from their source text on first access
+
+    Properties that are never read keep their original text, which GDSection.__str__
+    writes back out verbatim.
+    """
+
+    # Set when the properties may have changed since they were parsed or written out
+    _touched = False
+    # Set for good once a value that can be changed in place may be referenced from
+    # outside
+    _shared = False
+
+    def __init__(self, raw_items: Iterable[Tuple[str, str]] = ()) -> None:
+        self._data: OrderedDict = OrderedDict(
+            (k, RawValue(text)) for k, text in raw_items
+        )
+
+    def __getitem__(self, k: str) -> Any:
+        v = self.decode(k)
+        if _is_mutable(v):
+            self._touched = self._shared = True
+        return v
+
+    def decode(self, k: str) -> Any:
+        """Decode a value without counting it as a change, unlike __getitem__"""
+        v = self._data[k]
+        if isinstance(v, RawValue):
+            from .parser import parse_value
+
+            v = self._data[k] = parse_value(v.text)
+        return v
+
+    def __setitem__(self, k: str, v: Any) -> None:
+        self._touched = True
+        if _is_mutable(v):
+            self._shared = True
+        self._data[k] = v
+
+    def __delitem__(self, k: str) -> None:
+        self._touched = True
+        del self._data[k]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def raw_items(self) -> ItemsView:
+        """Items without decoding; undecoded values are RawValue instances"""
+        return self._data.items()
+
+    def __repr__(self) -> str:
+        return "LazyProperties(%r)" % list(self._data.items())
+
+
 class GDSection(metaclass=GDSectionMeta):
     """
     Represents a full section of a GD file
@@ -101,83 +262,240 @@ class GDSection(metaclass=GDSectionMeta):
 
     """
 
+    # (text, start, end) of the section in the text it was parsed from. Only set by
+    # the fast parser, and cleared when the section is changed.
+    source: Optional[Tuple[str, int, int]] = None
+    # The text the section was last written out as, cleared when it is changed
+    _rendered: Optional[str] = None
+    # Set for good once the properties or a value that can be changed in place may
+    # be referenced from outside the section. Changes to those can't be noticed, so
+    # the section is rendered every time after that.
+    _shared = False
+
     def __init__(self, header: GDSectionHeader, **kwargs) -> None:
-        self.header = header
-        self.properties = OrderedDict()
+        self._header = header
+        self._properties: MutableMapping = OrderedDict()
         for k, v in kwargs.items():
-            self.properties[k] = v
+            if _is_mutable(v):
+                self._shared = True
+            self._properties[k] = v
+
+    def _changed(self) -> None:
+        self.source = None
+        self._rendered = None
+
+    def _mark_shared(self) -> None:
+        """Called when values of the section may be changed in place from outside"""
+        self._changed()
+        self._shared = True
+
+    def _property_changed(self, k: Optional[str] = None) -> None:
+        """Called when a property, or any property if k is None, may change"""
+        indexed = self._header._indexed_properties
+        if indexed and (k is None or k in indexed):
+            _invalidate_indexes()
+
+    @property
+    def header(self) -> GDSectionHeader:
+        return self._header
+
+    @header.setter
+    def header(self, header: GDSectionHeader) -> None:
+        self._changed()
+        if self._header._indexed:
+            header._indexed = True
+            header._indexed_attributes = self._header._indexed_attributes
+            header._indexed_properties = self._header._indexed_properties
+            _invalidate_indexes()
+        self._header = header
+
+    @property
+    def properties(self) -> MutableMapping:
+        # LazyProperties keep track of their own changes
+        if not isinstance(self._properties, LazyProperties):
+            self._changed()
+            self._shared = True
+        self._property_changed()
+        return self._properties
+
+    @properties.setter
+    def properties(self, properties: MutableMapping) -> None:
+        self._changed()
+        self._property_changed()
+        self._shared = not isinstance(properties, LazyProperties)
+        self._properties = properties
+
+    @property
+    def unmodified_source(self) -> Optional[Tuple[str, int, int]]:
+        """
+        The source of this section if it may not have changed since it was parsed
+
+        Reading a value that could be changed in place, like a list or a GDObject,
+        counts as a change.
+        """
+        if self.source is None or self._header._touched:
+            return None
+        if isinstance(self._properties, LazyProperties) and self._properties._touched:
+            return None
+        return self.source
 
     def __getitem__(self, k: str) -> Any:
-        return self.properties[k]
+        v = self._properties[k]
+        if _is_mutable(v):
+            self._changed()
+            self._property_changed(k)
+            self._shared = True
+        return v
 
     def __setitem__(self, k: str, v: Any) -> None:
-        self.properties[k] = v
+        self._changed()
+        self._property_changed(k)
+        if _is_mutable(v):
+            self._shared = True
+        self._properties[k] = v
 
     def __delitem__(self, k: str) -> None:
+        self._changed()
+        self._property_changed(k)
         try:
-            del self.properties[k]
+            del self._properties[k]
         except KeyError:
             pass
 
     def get(self, k: str, default: Any = None) -> Any:
-        return self.properties.get(k, default)
+        v = self._properties.get(k, default)
+        if _is_mutable(v):
+            self._changed()
+            self._property_changed(k)
+            self._shared = True
+        return v
 
     @classmethod
     def from_parser(cls: Type[GDSectionType], parse_result) -> GDSectionType:
         header = parse_result[0]
         factory = GD_SECTION_REGISTRY.get(header.name, cls)
         section = factory.__new__(factory)
-        section.header = header
-        section.properties = OrderedDict()
+        section._header = header
+        section._properties = OrderedDict()
         for k, v in parse_result[1:]:
             if isinstance(v, tuple):
                 # Handle generic types like ('Array[int]', [1, 5, 3])
-                section[k] = v[1]
-            section[k] = v
+                section._properties[k] = v[1]
+            section._properties[k] = v
         return section
 
     @staticmethod
     def format_value(value: Any):
         """Formats the value based on its type, specifically handling generic type tuples."""
-        if (
-            isinstance(value, tuple)
-            and len(value) == 2
-            and isinstance(value[0], str)
-            and isinstance(value[1], list)
-        ):
-            # Handle generic types like ('Array[int]', [1, 5, 3])
-            type_name, elements = value
-            return f"{type_name}({elements})"
+        out: List[str] = []
+        _write_property(value, out)
+        return "".join(out)
+
+    def _copy_properties(self) -> OrderedDict:
+        """Copy the properties without counting it as a change"""
+        properties = self._properties
+        if isinstance(properties, LazyProperties):
+            return OrderedDict((k, properties.decode(k)) for k in properties)
+        return OrderedDict(properties)
+
+    def _property_items(self) -> Iterable[Tuple[str, Any]]:
+        if isinstance(self._properties, LazyProperties):
+            return self._properties.raw_items()
+        return self._properties.items()
+
+    def _cached_text(self) -> Optional[str]:
+        """The text of this section if it hasn't changed since it was last written"""
+        properties = self._properties
+        lazy = isinstance(properties, LazyProperties)
+        if self._header._touched or (lazy and properties._touched):
+            self._changed()
+            # Track changes from here on
+            self._header._touched = False
+            if lazy:
+                properties._touched = False
+            return None
+        if self.source is not None:
+            # Write untouched sections back out exactly as they were
+            text, start, end = self.source
+            return text[start:end].rstrip()
+        if self._shared or self._header._shared or (lazy and properties._shared):
+            # A value may have been changed in place since it was rendered
+            return None
+        return self._rendered
+
+    def _serialize(self, out: List[str]) -> None:
+        text = self._cached_text()
+        if text is None:
+            start = len(out)
+            self._header._serialize(out)
+            for k, v in self._property_items():
+                out.append("\n%s = " % (k,))
+                _write_property(v, out)
+            self._rendered = "".join(out[start:])
         else:
-            return stringify_object(value)
+            out.append(text)
+
+    def iter_serialized(self) -> Iterator[str]:
+        """
+        Serialize the section in pieces, one line per property
+
+        Unlike str(), this doesn't keep the text to reuse next time.
+        """
+        text = self._cached_text()
+        if text is not None:
+            yield text
+            return
+        yield str(self._header)
+        for k, v in self._property_items():
+            out = ["\n%s = " % (k,)]
+            _write_property(v, out)
+            yield "".join(out)
 
     def __str__(self) -> str:
-        ret = str(self.header)
-        if self.properties:
-            ret += "\n" + "\n".join(
-                [
-                    "%s = %s" % (k, self.format_value(v))
-                    for k, v in self.properties.items()
-                ]
-            )
-        return ret
+        out: List[str] = []
+        self._serialize(out)
+        return "".join(out)
 
     def __repr__(self) -> str:
-        return "%s(%s)" % (type(self).__name__, self.__str__())
+        return "%s(%s)" % (type(self).__name__, "".join(self.iter_serialized()))
 
     def __eq__(self, other: Any) -> bool:
         if not isinstance(other, GDSection):
             return False
-        return self.header == other.header and self.properties == other.properties
+        if self._header != other._header:
+            return False
+        if isinstance(self._properties, LazyProperties) or isinstance(
+            other._properties, LazyProperties
+        ):
+            # Reading the values through the mapping would count as a change
+            return self._copy_properties() == other._copy_properties()
+        return self._properties == other._properties
 
     def __ne__(self, other: Any) -> bool:
         return not self.__eq__(other)
 
 
+def _write_property(value: Any, out: List[str]) -> None:
+    if isinstance(value, RawValue):
+        # Untouched lazy property; write the original text back out
+        out.append(value.text)
+    elif (
+        isinstance(value, tuple)
+        and len(value) == 2
+        and isinstance(value[0], str)
+        and isinstance(value[1], list)
+    ):
+        # Handle generic types like ('Array[int]', [1, 5, 3])
+        type_name, elements = value
+        out.append(f"{type_name}({elements})")
+    else:
+        write_value(value, out)
+
+
 class GDExtResourceSection(GDSection):
     """Section representing an [ext_resource]"""
 
-    def __init__(self, path: str, type: str, id: int):
+    def __init__(self, path: str, type: str, id: Union[int, str]):
         super().__init__(GDSectionHeader("ext_resource", path=path, type=type, id=id))
 
     @property
@@ -197,11 +515,11 @@ class GDExtResourceSection(GDSection):
         self.header["type"] = type
 
     @property
-    def id(self) -> int:
+    def id(self) -> Union[int, str]:
         return self.header["id"]
 
     @id.setter
-    def id(self, id: int) -> None:
+    def id(self, id: Union[int, str]) -> None:
         self.header["id"] = id
 
     @property
@@ -212,7 +530,7 @@ class GDExtResourceSection(GDSection):
 class GDSubResourceSection(GDSection):
     """Section representing a [sub_resource]"""
 
-    def __init__(self, type: str, id: int, **kwargs):
+    def __init__(self, type: str, id: Union[int, str], **kwargs):
         super().__init__(GDSectionHeader("sub_resource", type=type, id=id), **kwargs)
 
     @property
@@ -224,11 +542,11 @@ class GDSubResourceSection(GDSection):
         self.header["type"] = type
 
     @property
-    def id(self) -> int:
+    def id(self) -> Union[int, str]:
         return self.header["id"]
 
     @id.setter
-    def id(self, id: int) -> None:
+    def id(self, id: Union[int, str]) -> None:
         self.header["id"] = id
 
     @property
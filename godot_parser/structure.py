@@ -31,7 +31,7 @@ section_header = (
         + Suppress(LineEnd())
     )
     .set_name("section_header")
-    .set_parse_action(GDSectionHeader.from_parser)
+    .set_parse_action(lambda p: GDSectionHeader.from_parser(p))
 )
 
 # texture = ExtResource( 1 )
@@ -45,7 +45,7 @@ section_contents = DelimitedList(section_entry, Empty()).set_name("section_conte
 section = (
     (section_header + Opt(section_contents))
     .set_name("section")
-    .set_parse_action(GDSection.from_parser)
+    .set_parse_action(lambda p: GDSection.from_parser(p))
 )
 
 # Exports
@@ -1,11 +1,15 @@
 """ Helper API for working with the Godot scene tree structure """
-from collections import OrderedDict
-from typing import Any, List, Optional, Union
+import copy
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-from .files import GDFile
-from .sections import GDNodeSection
+from .cache import Stamp, stat_stamp
+from .files import GDFile, GDScene
+from .sections import GDNodeSection, _is_mutable
 
-__all__ = ["Node", "TreeMutationException"]
+__all__ = ["Node", "ParentTreeCache", "TreeMutationException"]
 SENTINEL = object()
 
 
@@ -41,26 +45,50 @@ class Node(object):
         self._index = None
         self.section = section or GDNodeSection(name)
         self._groups = groups
-        self.properties = (
+        self._properties = (
             OrderedDict() if properties is None else OrderedDict(properties)
         )
         self._children = []  # type: ignore
         self._inherited_node: Optional["Node"] = None
-
-    def _mark_inherited(self) -> None:
-        clone = self.clone()
-        clone._inherited_node = self._inherited_node
-        self._inherited_node = clone
-        self.properties.clear()
-        self._type = None
-        self._instance = None
-        self.section = GDNodeSection(self.name)
+        # Copies of the mutable values read from _inherited_node, which may be shared
+        # with other scenes (see ParentTreeCache)
+        self._inherited_copies: Dict[str, Any] = {}
+        # Set when the node may differ from its section
+        self._changed = True
+
+    def _inherit(self) -> "Node":
+        """Create a copy of this subtree that inherits everything from it"""
+        node = Node(self.name)
+        node._inherited_node = self
+        for child in self._children:
+            node.add_child(child._inherit())
+        return node
 
     def clone(self) -> "Node":
         return Node(
-            self.name, self.type, self.instance, properties=OrderedDict(self.properties)
+            self.name,
+            self.type,
+            self.instance,
+            properties=OrderedDict(self._properties),
         )
 
+    def _share(self) -> None:
+        """Called when values that the node shares with its section are handed out"""
+        self._changed = True
+        # They may be changed in place after the tree is written back to the section
+        self.section._mark_shared()
+
+    @property
+    def properties(self) -> OrderedDict:
+        # The caller may change the properties in place
+        self._share()
+        return self._properties
+
+    @properties.setter
+    def properties(self, properties: OrderedDict) -> None:
+        self._changed = True
+        self._properties = properties
+
     @property
     def parent(self) -> Optional["Node"]:
         return self._parent
@@ -73,6 +101,7 @@ class Node(object):
     def name(self, new_name: str) -> None:
         if self._inherited_node is not None:
             raise TreeMutationException("Cannot change the name of an inherited node")
+        self._changed = True
         self._name = new_name
 
     @property
@@ -85,6 +114,7 @@ class Node(object):
     def type(self, new_type: Optional[str]) -> None:
         if self.is_inherited:
             raise TreeMutationException("Cannot change the type of an inherited node")
+        self._changed = True
         if new_type is not None:
             self._instance = None
         self._type = new_type
@@ -101,50 +131,83 @@ class Node(object):
             raise TreeMutationException(
                 "Cannot change the instance of an inherited node"
             )
+        self._changed = True
         if new_instance is not None:
             self._type = None
         self._instance = new_instance
 
+    def _inherited_value(self, k: str) -> Any:
+        """Read a value from the inherited nodes without copying it"""
+        node = self._inherited_node
+        while node is not None:
+            v = node._properties.get(k, SENTINEL)
+            if v is not SENTINEL:
+                return v
+            node = node._inherited_node
+        return SENTINEL
+
+    def _get_inherited(self, k: str) -> Any:
+        """Read a value from the inherited nodes, or SENTINEL"""
+        if k in self._inherited_copies:
+            return self._inherited_copies[k]
+        v = self._inherited_value(k)
+        if v is not SENTINEL and _is_mutable(v):
+            # Changing it in place mustn't change the parent scene's cached tree. Like
+            # values that are only read, it isn't written to this scene.
+            v = self._inherited_copies[k] = copy.deepcopy(v)
+        return v
+
     def __getitem__(self, k: str) -> Any:
-        v = self.properties.get(k, SENTINEL)
+        v = self._properties.get(k, SENTINEL)
         if v is SENTINEL:
-            if self._inherited_node is not None:
-                return self._inherited_node[k]
-            raise KeyError("No property %s found on node %s" % (k, self.name))
+            v = self._get_inherited(k)
+            if v is SENTINEL:
+                raise KeyError("No property %s found on node %s" % (k, self.name))
+            return v
+        if _is_mutable(v):
+            self._share()
         return v
 
     def __setitem__(self, k: str, v: Any) -> None:
-        if self._inherited_node is not None and v == self._inherited_node.get(
-            k, SENTINEL
-        ):
+        self._inherited_copies.pop(k, None)
+        if self._inherited_node is not None and v == self._inherited_value(k):
             del self[k]
         else:
-            self.properties[k] = v
+            self._changed = True
+            self._properties[k] = v
 
     def __delitem__(self, k: str) -> None:
+        self._inherited_copies.pop(k, None)
         try:
-            del self.properties[k]
+            del self._properties[k]
         except KeyError:
             pass
+        else:
+            self._changed = True
 
     def get(self, k: str, default: Any = None) -> Any:
-        v = self.properties.get(k, SENTINEL)
+        v = self._properties.get(k, SENTINEL)
         if v is SENTINEL:
-            if self._inherited_node is not None:
-                return self._inherited_node.get(k, default)
-            return default
+            v = self._get_inherited(k)
+            return default if v is SENTINEL else v
+        if _is_mutable(v):
+            self._share()
         return v
 
     @classmethod
     def from_section(cls, section: GDNodeSection):
         """Create a Node from a GDNodeSection"""
-        return cls(
+        node = cls(
             section.name,
             section.type,
             section.instance,
             section,
-            properties=section.properties,
+            groups=section.header._attributes.get("groups"),
         )
+        # Reading the section this way doesn't count as changing it
+        node._properties = section._copy_properties()
+        node._changed = False
+        return node
 
     def flatten(self, path: Optional[str] = None):
         """
@@ -176,12 +239,17 @@ class Node(object):
             yield from child.flatten(child_path)
 
     def _update_section(self, path: Optional[str] = None) -> None:
+        # Setting a header attribute to the value it already has doesn't change the
+        # section, but setting the rest of it does, so only do that if needed
         self.section.name = self.name
-        self.section.type = self._type
+        if self._changed:
+            self.section.type = self._type
         self.section.parent = path
-        self.section.instance = self._instance
-        self.section.groups = self._groups
-        self.section.properties = self.properties
+        if self._changed:
+            self.section.instance = self._instance
+            self.section.groups = self._groups
+            self.section.properties = self._properties
+            self._changed = False
         if self._index is not None:
             self.section.index = self._index
 
@@ -191,7 +259,7 @@ class Node(object):
 
     @property
     def has_changes(self) -> bool:
-        return bool(self.properties)
+        return bool(self._properties)
 
     def get_children(self) -> List["Node"]:
         """Get all children of this node"""
@@ -226,14 +294,12 @@ class Node(object):
         self._children.insert(index, node)
         node._parent = self
 
-    def _merge_child(self, section: GDNodeSection) -> None:
-        """Add a child that may be an inherited node"""
-        for child in self._children:
-            if child.name == section.name:
-                child.section = section
-                child.properties = section.properties
-                return
-        self.add_child(Node.from_section(section))
+    def _merge_section(self, section: GDNodeSection) -> None:
+        """Use the section of an inherited node that this scene changes"""
+        self.section = section
+        self._groups = section.header._attributes.get("groups")
+        self._properties = section._copy_properties()
+        self._changed = False
 
     def remove_from_parent(self) -> None:
         """Remove this node from its parent"""
@@ -285,6 +351,8 @@ class Tree(object):
 
     def __init__(self, root: Optional[Node] = None):
         self.root = root
+        # The parent scene files this tree inherits from, for cache validation
+        self._sources: List[Tuple[str, Stamp]] = []
 
     def get_node(self, path: str) -> Optional[Node]:
         """Mimics the Godot get_node() behavior"""
@@ -296,21 +364,35 @@ class Tree(object):
     def build(cls, file: GDFile):
         """Build the Tree from a flat list of [node]'s"""
         tree = cls()
+        # The nodes by path, so that finding a parent or an inherited node doesn't
+        # search through all of its siblings
+        nodes: Dict[str, Node] = {}
         # Makes assumptions that the nodes are well-ordered
         for section in file.get_nodes():
             if section.parent is None:
                 root = Node.from_section(section)
                 tree.root = root
                 if root.instance is not None:
-                    _load_parent_scene(root, file)
+                    tree._sources = _load_parent_scene(root, file)
+                nodes = _index_paths(root)
             else:
-                parent = tree.get_node(section.parent)
+                parent = nodes.get(section.parent) or tree.get_node(section.parent)
                 if parent is None:
                     raise TreeMutationException(
                         "Cannot find parent node %s of %s"
                         % (section.parent, section.name)
                     )
-                parent._merge_child(section)
+                if section.parent == ".":
+                    path = section.name
+                else:
+                    path = section.parent + "/" + section.name
+                node = nodes.get(path)
+                if node is None:
+                    node = Node.from_section(section)
+                    parent.add_child(node)
+                    nodes[path] = node
+                else:
+                    node._merge_section(section)
         return tree
 
     def flatten(self) -> List[GDNodeSection]:
@@ -325,15 +407,74 @@ class Tree(object):
         return ret
 
 
-def _load_parent_scene(root: Node, file: GDFile):
-    parent_file: GDFile = file.load_parent_scene()
-    parent_tree = Tree.build(parent_file)
-    # Transfer parent scene's children to this scene
+class ParentTreeCache(object):
+    """
+    Trees of parent scenes, shared by all of the scenes that inherit from them
+
+    Entries are keyed by path and checked against the stat of the parent scene and
+    all of its own parents. The shared nodes are never modified: inherited scenes
+    get new nodes that read the parent's values through _inherited_node, and copy
+    values that could be modified in place when they are read.
+    """
+
+    def __init__(self, max_entries: int = 64) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tree]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, filepath: str) -> Tree:
+        """Return the tree of the scene at filepath"""
+        filepath = os.path.abspath(filepath)
+        with self._lock:
+            tree = self._entries.get(filepath)
+        if tree is not None and _is_fresh(tree._sources):
+            with self._lock:
+                if filepath in self._entries:
+                    self._entries.move_to_end(filepath)
+            return tree
+        stamp = stat_stamp(filepath)
+        tree = Tree.build(GDScene.load(filepath))
+        tree._sources = [(filepath, stamp)] + tree._sources
+        with self._lock:
+            self._entries[filepath] = tree
+            self._entries.move_to_end(filepath)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return tree
+
+    def clear(self) -> None:
+        """Delete all entries"""
+        with self._lock:
+            self._entries.clear()
+
+
+PARENT_TREE_CACHE = ParentTreeCache()
+
+
+def _index_paths(root: Node) -> Dict[str, Node]:
+    """Map the paths of all of the nodes under root to the nodes"""
+    nodes = {".": root}
+    queue = deque((child, child.name) for child in root.get_children())
+    while queue:
+        node, path = queue.popleft()
+        # get_node() finds the first node with a name
+        nodes.setdefault(path, node)
+        queue.extend((child, path + "/" + child.name) for child in node.get_children())
+    return nodes
+
+
+def _is_fresh(sources: List[Tuple[str, Stamp]]) -> bool:
+    try:
+        return all(stat_stamp(path) == stamp for path, stamp in sources)
+    except OSError:
+        return False
+
+
+def _load_parent_scene(root: Node, file: GDFile) -> List[Tuple[str, Stamp]]:
+    parent_tree = PARENT_TREE_CACHE.get(file._parent_scene_path())
     assert parent_tree.root is not None, "Parent scene has no root node"
+    # Give this scene its own copies of the parent scene's children
     for child in parent_tree.root.get_children():
-        root.add_child(child)
-    # Mark the entire parent tree as inherited
-    for node in parent_tree.root.flatten():
-        node._mark_inherited()
-    # Mark the root node as inherited
+        root.add_child(child._inherit())
     root._inherited_node = parent_tree.root
+    return parent_tree._sources
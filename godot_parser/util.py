@@ -1,30 +1,115 @@
 """ Utils """
 
-import json
+import io
 import os
-from typing import Optional
+from json.encoder import encode_basestring_ascii  # type: ignore[attr-defined]
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+# Writers append the serialized form of a value to a list of strings
+Writer = Callable[[Any, List[str]], None]
 
-def stringify_object(value):
+
+def stringify_object(value: Any) -> str:
     """Serialize a value to the godot file format"""
-    if value is None:
-        return "null"
-    elif isinstance(value, str):
-        return json.dumps(value)
-    elif isinstance(value, bool):
-        return "true" if value else "false"
-    elif isinstance(value, dict):
-        return (
-            "{\n"
-            + ",\n".join(
-                ['"%s": %s' % (k, stringify_object(v)) for k, v in value.items()]
-            )
-            + "\n}"
-        )
-    elif isinstance(value, list):
-        return "[ " + ", ".join([stringify_object(v) for v in value]) + " ]"
+    out: List[str] = []
+    write_value(value, out)
+    return "".join(out)
+
+
+def write_value(value: Any, out: List[str]) -> None:
+    """Append the serialized form of a value to out"""
+    (_WRITERS.get(type(value)) or _find_writer(type(value)))(value, out)
+
+
+def register_writer(cls: type, writer: Writer) -> None:
+    """
+    Use a writer for a class instead of str()
+
+    The writer is used for subclasses too, unless they override __str__.
+    """
+    _WRITERS[cls] = writer
+    _CUSTOM_WRITERS[cls] = writer
+
+
+def _find_writer(cls: type) -> Writer:
+    writer = _write_str
+    for base in _BUILTIN_TYPES:
+        if issubclass(cls, base):
+            writer = _WRITERS[base]
+            break
     else:
-        return str(value)
+        for base in cls.__mro__:
+            if base in _CUSTOM_WRITERS:
+                if cls.__str__ is base.__str__:
+                    writer = _CUSTOM_WRITERS[base]
+                break
+    _WRITERS[cls] = writer
+    return writer
+
+
+def _write_str(value: Any, out: List[str]) -> None:
+    out.append(str(value))
+
+
+def _write_none(value: None, out: List[str]) -> None:
+    out.append("null")
+
+
+def _write_bool(value: bool, out: List[str]) -> None:
+    out.append("true" if value else "false")
+
+
+def _write_string(value: str, out: List[str]) -> None:
+    # The same escaping as json.dumps, without its overhead
+    out.append(encode_basestring_ascii(value))
+
+
+def _write_dict(value: dict, out: List[str]) -> None:
+    out.append("{\n")
+    first = True
+    for k, v in value.items():
+        if first:
+            first = False
+        else:
+            out.append(",\n")
+        out.append('"%s": ' % (k,))
+        (_WRITERS.get(type(v)) or _find_writer(type(v)))(v, out)
+    out.append("\n}")
+
+
+def _write_list(value: list, out: List[str]) -> None:
+    out.append("[ ")
+    first = True
+    for v in value:
+        if first:
+            first = False
+        else:
+            out.append(", ")
+        (_WRITERS.get(type(v)) or _find_writer(type(v)))(v, out)
+    out.append(" ]")
+
+
+# Subclasses of these are serialized like their base class, whatever their __str__
+_BUILTIN_TYPES: Tuple[type, ...] = (type(None), str, bool, dict, list)
+
+_WRITERS: Dict[type, Writer] = {
+    type(None): _write_none,
+    str: _write_string,
+    bool: _write_bool,
+    int: _write_str,
+    float: _write_str,
+    dict: _write_dict,
+    list: _write_list,
+}
+
+_CUSTOM_WRITERS: Dict[type, Writer] = {}
+
+
+def is_binary_stream(stream: Any) -> bool:
+    """True if a file object reads or writes bytes instead of str"""
+    if isinstance(stream, (io.RawIOBase, io.BufferedIOBase)):
+        return True
+    return "b" in getattr(stream, "mode", "")
 
 
 def find_project_root(start: str) -> Optional[str]:
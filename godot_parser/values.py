@@ -49,7 +49,7 @@ obj_type = (
     + Suppress("(")
     + DelimitedList(value)
     + Suppress(")")
-).set_parse_action(GDObject.from_parser)
+).set_parse_action(lambda p: GDObject.from_parser(p))
 
 # [ 1, 2 ] or [ 1, 2, ]
 list_ = (
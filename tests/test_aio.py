@@ -0,0 +1,59 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from godot_parser import GDScene, aload, aload_many
+
+SCENE = """[gd_scene load_steps=1 format=2]
+
+[node name="Root%d" type="Node2D"]
+position = Vector2( 1, 2 )
+"""
+
+
+class TestAsyncio(unittest.TestCase):
+    """Tests for the asyncio API"""
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.tmpdir = tmpdir.name
+        self.paths = []
+        for i in range(5):
+            path = os.path.join(self.tmpdir, "Scene%d.tscn" % i)
+            with open(path, "w", encoding="utf-8") as ofile:
+                ofile.write(SCENE % i)
+            self.paths.append(path)
+
+    def test_aload(self):
+        """Files can be loaded in the default executor or a process pool"""
+        scene = asyncio.run(aload(self.paths[0], engine="fast"))
+        self.assertEqual(str(scene), SCENE % 0)
+        self.assertEqual(scene.project_root, None)
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            scene = asyncio.run(aload(self.paths[1], executor, lazy=True))
+        self.assertIsInstance(scene, GDScene)
+        self.assertEqual(str(scene), SCENE % 1)
+
+    def test_aload_many(self):
+        """Many files are loaded in order, with limited concurrency"""
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            scenes = asyncio.run(aload_many(self.paths, executor, limit=2))
+        self.assertEqual([str(s) for s in scenes], [SCENE % i for i in range(5)])
+
+    def test_awrite(self):
+        """Files can be written without blocking the event loop"""
+        scene = GDScene()
+        scene.add_node("Root", "Node2D")
+        path = os.path.join(self.tmpdir, "Out.tscn")
+
+        async def write():
+            return [
+                await scene.awrite(path, only_if_changed=True),
+                await scene.awrite(path, only_if_changed=True),
+            ]
+
+        self.assertEqual(asyncio.run(write()), [True, False])
+        self.assertEqual(GDScene.load(path), scene)
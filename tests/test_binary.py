@@ -0,0 +1,161 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from godot_parser import (
+    GDFile,
+    GDResource,
+    GDScene,
+    GodotBinaryException,
+    NodePath,
+    PoolVector2Array,
+    SubResource,
+    Vector2,
+    parse,
+)
+
+TEXT_RESOURCE = """[gd_resource type="Resource" load_steps=3 format=2]
+
+[ext_resource path="res://icon.png" type="Texture" id=1]
+
+[sub_resource type="Gradient" id=2]
+offsets = PoolRealArray( 0, 0.5, 1 )
+colors = PoolColorArray( 1, 0, 0, 1, 0, 0.25, 1, 1 )
+
+[resource]
+int = 1
+int64 = 10000000000
+float = 0.1
+double = 0.123456789012
+string = "a \\"quoted\\" string"
+null = null
+bool = true
+vector = Vector2( 1.5, -2 )
+transform = Transform( 1, 0, 0, 0, 1, 0, 0, 0, 1, 4, 5, 6 )
+color = Color( 1, 0.5, 0.25, 1 )
+path = NodePath("../A/B:position:x")
+array = [ 1, "x", [ 2 ] ]
+dict = {
+"k": 1,
+"j": [ 3 ]
+}
+texture = ExtResource( 1 )
+gradient = SubResource( 2 )
+ints = PoolIntArray( 1, -2, 3 )
+bytes = PoolByteArray( 1, 2, 255 )
+strings = PoolStringArray( "a", "bc" )
+points = PoolVector2Array( 0.5, 1, 2, 3 )
+"""
+
+
+def _string(value: str) -> bytes:
+    data = value.encode("utf-8") + b"\0"
+    return struct.pack("<I", len(data)) + data
+
+
+class TestBinary(unittest.TestCase):
+    """Tests for the binary resource format"""
+
+    def test_round_trip(self):
+        """Resources are written and read back without changes"""
+        resource = parse(TEXT_RESOURCE)
+        data = resource.to_binary()
+        self.assertEqual(data[:4], b"RSRC")
+        result = GDFile.from_binary(data)
+        self.assertIsInstance(result, GDResource)
+        self.assertEqual(result, resource)
+        self.assertEqual(str(result), TEXT_RESOURCE)
+        self.assertEqual(result.to_binary(), data)
+
+    def test_round_trip_godot4(self):
+        """format=3 resources use the Godot 4 layout, with uids"""
+        contents = (
+            '[gd_resource type="Resource" script_class="Stats" load_steps=2 '
+            'format=3 uid="uid://cx4b5b7e8wy3"]\n\n'
+            '[ext_resource type="Script" uid="uid://b1e8kx0p8c2k" '
+            'path="res://stats.gd" id=1]\n\n'
+            "[resource]\n"
+            "script = ExtResource( 1 )\n"
+            "points = PackedVector2Array( 0.5, 1 )\n"
+        )
+        resource = parse(contents)
+        result = GDFile.from_binary(resource.to_binary())
+        self.assertEqual(str(result), contents)
+
+    def test_round_trip_real64(self):
+        """Double-precision resources keep the precision of real numbers"""
+        for fmt, array in ((2, "PoolVector2Array"), (3, "PackedVector2Array")):
+            contents = (
+                '[gd_resource type="Resource" load_steps=1 format=%d]\n\n'
+                "[resource]\n"
+                "speed = 0.123456789\n"
+                "offset = Vector2( 0.123456789, 1e-100 )\n"
+                "points = %s( 0.123456789, 2 )\n" % (fmt, array)
+            )
+            resource = parse(contents)
+            data = resource.to_binary(real64=True)
+            result = GDFile.from_binary(data)
+            self.assertEqual(str(result), contents)
+            self.assertEqual(result.to_binary(real64=True), data)
+            # Single precision rounds them
+            rounded = GDFile.from_binary(parse(contents).to_binary())
+            self.assertEqual(rounded.get_sections()[1]["offset"].args[0], 0.12345679)
+
+    def test_read(self):
+        """Read a Godot 3 resource byte by byte"""
+        data = (
+            b"RSRC"
+            + struct.pack("<5I", 0, 0, 3, 1, 3)
+            + _string("Resource")
+            + struct.pack("<Q", 0)
+            + struct.pack("<14I", *[0] * 14)
+            # String table
+            + struct.pack("<I", 2)
+            + _string("position")
+            + _string("child")
+            # External resources
+            + struct.pack("<I", 0)
+            # Internal resources and their offsets
+            + struct.pack("<I", 2)
+            + _string("local://1")
+            + struct.pack("<Q", 185)
+            + _string("res://main.res")
+            + struct.pack("<Q", 218)
+            # local://1
+            + _string("Resource")
+            + struct.pack("<3I2f", 1, 0, 10, 1.5, 2)
+            # Main resource
+            + _string("Resource")
+            + struct.pack("<5I", 1, 1, 24, 2, 1)
+            + b"RSRC"
+        )
+        sections = GDFile.from_binary(data).get_sections()
+        self.assertEqual(sections[1]["position"], Vector2(1.5, 2))
+        self.assertEqual(sections[2]["child"], SubResource(1))
+        with self.assertRaises(GodotBinaryException):
+            GDFile.from_binary(data[:-40])
+        with self.assertRaises(NotImplementedError):
+            GDFile.from_binary(b"RSCC" + data[4:])
+
+    def test_load_and_write(self):
+        """load() detects binary files and write() can produce them"""
+        resource = parse(TEXT_RESOURCE)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "resource.res")
+            resource.write(filename, binary=True)
+            result = GDFile.load(filename)
+        self.assertEqual(result, resource)
+        section = result.find_section("resource")
+        self.assertEqual(section["path"], NodePath("../A/B:position:x"))
+        self.assertIsInstance(section["points"], PoolVector2Array)
+
+    def test_unsupported(self):
+        """Scenes and unknown objects can't be written in the binary format"""
+        with self.assertRaises(GodotBinaryException):
+            GDScene().to_binary()
+        resource = parse(
+            '[gd_resource type="Resource" format=2]\n\n[resource]\nx = Foo( 1 )\n'
+        )
+        with self.assertRaises(GodotBinaryException):
+            resource.to_binary()
@@ -0,0 +1,148 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from godot_parser import DiskCache, FileCache, GDFile, GDScene, load
+
+SCENE = """[gd_scene load_steps=2 format=2]
+
+[ext_resource path="res://Player.tscn" type="PackedScene" id=1]
+
+[node name="Root" type="Node2D"]
+position = Vector2( 1, 2 )
+"""
+
+
+class TestDiskCache(unittest.TestCase):
+    """Tests for the persistent parse cache"""
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.tmpdir = tmpdir.name
+        self.path = os.path.join(self.tmpdir, "Scene.tscn")
+        with open(self.path, "w", encoding="utf-8") as ofile:
+            ofile.write(SCENE)
+        self.cache = DiskCache(os.path.join(self.tmpdir, "cache"))
+
+    def test_hit(self):
+        """The second load comes from the cache without parsing"""
+        scene = load(self.path, engine="fast", cache=self.cache)
+        self.assertEqual(len(os.listdir(self.cache.directory)), 1)
+        with mock.patch.object(GDFile, "parse", side_effect=AssertionError):
+            cached = load(self.path, engine="fast", cache=self.cache)
+        self.assertIsInstance(cached, GDScene)
+        self.assertEqual(cached, scene)
+        self.assertEqual(str(cached), SCENE)
+        self.assertEqual(cached.project_root, scene.project_root)
+
+    def test_invalidation(self):
+        """Changing the contents, options or library version misses the cache"""
+        load(self.path, engine="fast", cache=self.cache)
+        load(self.path, engine="fast", lazy=True, cache=self.cache)
+        self.assertEqual(len(os.listdir(self.cache.directory)), 2)
+        with open(self.path, "a", encoding="utf-8") as ofile:
+            ofile.write('\n[node name="Child" type="Node" parent="."]\n')
+        scene = load(self.path, engine="fast", cache=self.cache)
+        self.assertEqual(len(scene.get_nodes()), 2)
+        with mock.patch("godot_parser.__version__", "999"):
+            with mock.patch.object(GDFile, "parse", wraps=GDFile.parse) as parse:
+                load(self.path, engine="fast", cache=self.cache)
+        parse.assert_called_once()
+
+    def test_corrupt_entry(self):
+        """Unreadable entries are treated as misses and replaced"""
+        load(self.path, engine="fast", cache=self.cache)
+        (name,) = os.listdir(self.cache.directory)
+        entry = os.path.join(self.cache.directory, name)
+        with open(entry, "wb") as ofile:
+            ofile.write(b"garbage")
+        scene = load(self.path, engine="fast", cache=self.cache)
+        self.assertEqual(str(scene), SCENE)
+        self.assertEqual(self.cache.get(name[: -len(".pickle")]), scene)
+
+    def test_eviction(self):
+        """The least recently used entries are evicted to stay under max_size"""
+        self.cache.put("a", "x" * 1000)
+        os.utime(os.path.join(self.cache.directory, "a.pickle"), (1, 1))
+        self.cache.put("b", "y" * 1000)
+        os.utime(os.path.join(self.cache.directory, "b.pickle"), (2, 2))
+        # Reading an entry marks it as recently used
+        self.assertEqual(self.cache.get("a"), "x" * 1000)
+        self.cache.max_size = 2500
+        self.cache.put("c", "z" * 1000)
+        self.assertEqual(
+            sorted(os.listdir(self.cache.directory)), ["a.pickle", "c.pickle"]
+        )
+        self.cache.clear()
+        self.assertEqual(os.listdir(self.cache.directory), [])
+
+    def test_default_directory(self):
+        """The directory defaults to $GODOT_PARSER_CACHE_DIR or the XDG cache"""
+        with mock.patch.dict(os.environ, {"GODOT_PARSER_CACHE_DIR": self.tmpdir}):
+            self.assertEqual(DiskCache().directory, self.tmpdir)
+        with mock.patch.dict(
+            os.environ, {"GODOT_PARSER_CACHE_DIR": "", "XDG_CACHE_HOME": self.tmpdir}
+        ):
+            self.assertEqual(
+                DiskCache().directory, os.path.join(self.tmpdir, "godot_parser")
+            )
+
+
+class TestFileCache(unittest.TestCase):
+    """Tests for the in-memory file cache"""
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.paths = []
+        for i in range(3):
+            path = os.path.join(tmpdir.name, "Scene%d.tscn" % i)
+            with open(path, "w", encoding="utf-8") as ofile:
+                ofile.write(SCENE)
+            self.paths.append(path)
+
+    def test_hit(self):
+        """Hits return a copy without parsing"""
+        cache = FileCache()
+        scene = load(self.paths[0], cache=cache)
+        with mock.patch.object(GDFile, "parse", side_effect=AssertionError):
+            cached = load(self.paths[0], cache=cache)
+        self.assertEqual(cached, scene)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        # Modifying the result doesn't modify the cache
+        cached.get_node()["position"] = None
+        scene.get_node().name = "Changed"
+        self.assertEqual(str(load(self.paths[0], cache=cache)), SCENE)
+
+    def test_stat_validation(self):
+        """Entries for files that changed on disk are reloaded"""
+        cache = FileCache()
+        load(self.paths[0], cache=cache)
+        with open(self.paths[0], "a", encoding="utf-8") as ofile:
+            ofile.write('\n[node name="Child" type="Node" parent="."]\n')
+        scene = load(self.paths[0], cache=cache)
+        self.assertEqual(len(scene.get_nodes()), 2)
+        load(self.paths[0], cache=cache, lazy=True)
+        self.assertEqual((cache.hits, cache.misses), (0, 3))
+
+    def test_eviction(self):
+        """The least recently used entries are evicted by count and memory"""
+        cache = FileCache(max_entries=2)
+        for path in self.paths[:2]:
+            load(path, cache=cache)
+        load(self.paths[0], cache=cache)
+        load(self.paths[2], cache=cache)
+        self.assertEqual((len(cache), cache.evictions), (2, 1))
+        load(self.paths[0], cache=cache)
+        load(self.paths[1], cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+
+        cache = FileCache(max_entries=None)
+        load(self.paths[0], cache=cache)
+        cache.max_memory = cache.memory
+        load(self.paths[1], cache=cache)
+        self.assertEqual((len(cache), cache.evictions), (1, 1))
+        cache.clear()
+        self.assertEqual((len(cache), cache.memory), (0, 0))
@@ -1,8 +1,28 @@
+import gzip
+import io
+import os
+import pickle
 import tempfile
 import unittest
-
-from godot_parser import GDFile, GDObject, GDResource, GDResourceSection, GDScene, Node
-from godot_parser.sections import GDExtResourceSection, GDSubResourceSection
+from unittest import mock
+
+from godot_parser import (
+    ExtResource,
+    GDFile,
+    GDObject,
+    GDResource,
+    GDResourceSection,
+    GDScene,
+    GDSection,
+    GDSectionHeader,
+    Node,
+)
+from godot_parser.parser import GodotParseException
+from godot_parser.sections import (
+    GDExtResourceSection,
+    GDNodeSection,
+    GDSubResourceSection,
+)
 from tests.snapshot_manager import SnapshotManager
 
 
@@ -80,6 +100,33 @@ class TestGDFile(unittest.TestCase):
         self.assertTrue(result)
         self.assertEqual(len(scene.get_sections()), 0)
 
+    def test_remove_section_identity(self):
+        """remove_section prefers the same section over an equal one"""
+        scene = GDScene()
+        first = scene.add_node("Child", parent=".")
+        second = scene.add_node("Child", parent=".")
+        self.assertTrue(scene.remove_section(second))
+        self.assertIs(scene.get_nodes()[0], first)
+        self.assertTrue(scene.remove_section(GDNodeSection("Child", parent=".")))
+        self.assertEqual(scene.get_nodes(), [])
+
+    def test_remove_sections(self):
+        """remove_sections removes sections or the ones that match a function"""
+        scene = GDScene()
+        res = scene.add_ext_resources(
+            [("res://A.png", "Texture"), ("res://B.png", "Texture")]
+        )
+        sub = scene.add_sub_resource("Animation")
+        node = scene.add_node("RootNode")
+        removed = scene.remove_sections(iter([sub, res[0], GDResourceSection()]))
+        self.assertEqual(removed, [res[0], sub])
+        self.assertEqual(scene.get_sections()[1:], [res[1], node])
+        self.assertEqual(scene.load_steps, 2)
+        removed = scene.remove_sections(lambda s: s.header.name == "node")
+        self.assertEqual(removed, [node])
+        self.assertIsNone(scene.find_node(name="RootNode"))
+        self.assertEqual(scene.remove_sections([]), [])
+
     def test_section_ordering(self):
         """Sections maintain an ordering"""
         scene = GDScene()
@@ -88,6 +135,73 @@ class TestGDFile(unittest.TestCase):
         res = scene.find_section("ext_resource")
         self.assertEqual(scene.get_sections()[1:], [res, node])
 
+    def test_add_sections(self):
+        """add_sections puts sections in the same places as add_section"""
+
+        def new_sections():
+            return [
+                GDNodeSection("Child", parent="."),
+                GDExtResourceSection("res://Other.tscn", "PackedScene", 1),
+                GDSubResourceSection("Animation", 1),
+                GDNodeSection("Child2", parent="."),
+            ]
+
+        expected = GDScene()
+        expected.add_node("RootNode")
+        for section in new_sections():
+            expected.add_section(section)
+        scene = GDScene()
+        scene.add_node("RootNode")
+        scene.add_sections(new_sections())
+        self.assertEqual(scene, expected)
+        self.assertEqual(scene.load_steps, 3)
+        self.assertEqual(scene.find_node(name="Child2").parent, ".")
+        with self.assertRaises(ValueError):
+            scene.add_sections([GDSection(GDSectionHeader("unknown"))])
+        self.assertEqual(scene, expected)
+
+        # Files with sections out of order
+        node = GDNodeSection("RootNode")
+        res = GDExtResourceSection("res://Other.tscn", "PackedScene", 1)
+        scene = GDFile(node, res)
+        sub = GDSubResourceSection("Animation", 1)
+        scene.add_sections([sub])
+        self.assertEqual(scene.get_sections(), [sub, node, res])
+        self.assertEqual(scene.get_sub_resources(), [sub])
+
+    def test_resource_ids(self):
+        """New resources get unused ids"""
+        scene = GDScene()
+        resources = scene.add_ext_resources(
+            [("res://A.png", "Texture"), ("res://B.png", "Texture")]
+        )
+        self.assertEqual([r.id for r in resources], [1, 2])
+        self.assertEqual(scene.get_ext_resources(), resources)
+        self.assertEqual(scene.load_steps, 3)
+        res = scene.add_ext_resource("res://C.png", "Texture")
+        self.assertEqual(res.id, 3)
+        scene.remove_section(res)
+        scene.remove_section(resources[0])
+        self.assertEqual(scene.add_ext_resource("res://D.png", "Texture").id, 3)
+        scene.reuse_resource_ids = True
+        self.assertEqual(scene.add_ext_resource("res://E.png", "Texture").id, 1)
+        self.assertEqual(scene.add_ext_resource("res://F.png", "Texture").id, 4)
+        self.assertEqual(scene.add_sub_resource("Animation").id, 1)
+
+        # Godot 4 ids
+        scene = GDScene.parse(
+            """[gd_scene load_steps=2 format=3]
+
+[ext_resource type="Texture2D" path="res://A.png" id="1_abcde"]
+"""
+        )
+        resources = scene.add_ext_resources(
+            [("res://B.png", "Texture2D"), ("res://C.png", "Texture2D")]
+        )
+        self.assertRegex(resources[0].id, "^2_[a-z0-9]{5}$")
+        self.assertRegex(resources[1].id, "^3_[a-z0-9]{5}$")
+        self.assertRegex(scene.add_sub_resource("Animation").id, "^Animation_")
+
     def test_add_ext_node(self):
         """Test GDScene.add_ext_node"""
         scene = GDScene()
@@ -106,6 +220,61 @@ class TestGDFile(unittest.TestCase):
 
         self.assertEqual(scene, gen_scene)
 
+    def test_load_sections(self):
+        """Load only some section types"""
+        scene = GDScene()
+        scene.add_ext_resource("res://Other.tscn", "PackedScene")
+        scene.add_sub_resource("CircleShape2D")
+        scene.add_node("RootNode", type="Node2D")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            outfile = os.path.join(tmpdir, "Scene.tscn")
+            scene.write(outfile)
+            loaded = GDScene.load(outfile, sections={"ext_resource"})
+            self.assertIsInstance(loaded, GDScene)
+            self.assertEqual(loaded.get_sections(), scene.get_sections()[:2])
+
+            # Reading stops before the invalid node section
+            with open(outfile, "a", encoding="utf-8") as ofile:
+                ofile.write("[node name=]\n")
+            loaded = GDScene.load(
+                outfile, sections={"ext_resource"}, stop_after_last=True
+            )
+            self.assertEqual(len(loaded.get_sections()), 2)
+            with self.assertRaises(GodotParseException):
+                GDScene.load(outfile, sections={"ext_resource", "node"})
+
+    def test_load_memory_map(self):
+        """Loading through a memory map gives the same file"""
+        scene = GDScene()
+        scene.add_ext_resource("res://Other.tscn", "PackedScene")
+        scene.add_node("RootNode", type="Node2D")
+        scene.add_node("Child", type="Label", parent=".")["text"] = "[text]\n["
+        with tempfile.TemporaryDirectory() as tmpdir:
+            outfile = os.path.join(tmpdir, "Scene.tscn")
+            scene.write(outfile)
+            self.assertEqual(GDScene.load(outfile, memory_map=True), scene)
+            loaded = GDScene.load(outfile, memory_map=True, sections={"node"})
+            self.assertEqual(
+                loaded.get_sections(), [scene.get_sections()[0], *scene.get_nodes()]
+            )
+
+    def test_load_workers(self):
+        """Loading with worker processes gives the same file"""
+        scene = GDScene()
+        for i in range(20):
+            scene.add_sub_resource("CircleShape2D", radius=i)
+        scene.add_node("RootNode", type="Node2D")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            outfile = os.path.join(tmpdir, "Scene.tscn")
+            scene.write(outfile)
+            self.assertEqual(GDScene.load(outfile, workers=2), scene)
+
+            with open(outfile, "a", encoding="utf-8") as ofile:
+                ofile.write("[node]\nkey = 1 2\n")
+            with self.assertRaises(GodotParseException) as cm:
+                GDScene.load(outfile, workers=2)
+            self.assertEqual(cm.exception.lineno, len(str(scene).splitlines()) + 2)
+
     def test_get_node_none(self):
         """get_node() works with no nodes"""
         scene = GDScene()
@@ -149,6 +318,38 @@ class TestGDFile(unittest.TestCase):
         resources = scene.get_sections("ext_resource")
         self.assertEqual(len(resources), 0)
 
+    def test_resource_references_keep_source(self):
+        """Finding resource references doesn't count as changing the sections"""
+        text = """[gd_scene load_steps=3 format=2]
+
+[ext_resource path="res://A.png" type="Texture" id=1]
+
+[ext_resource path="res://B.png" type="Texture" id=3]
+
+[node name="Root" type="Node2D"]
+position = Vector2(1, 2)
+
+[node name="Sprite" type="Sprite" parent="."]
+texture = ExtResource(3)
+"""
+        for lazy in (False, True):
+            scene = GDScene.parse(text, engine="fast", lazy=lazy)
+            scene.remove_unused_resources()
+            self.assertEqual(len(scene.get_ext_resources()), 1)
+            root, sprite = scene.get_nodes()
+            self.assertIsNotNone(root.unmodified_source)
+            scene.renumber_resource_ids()
+            self.assertIsNotNone(root.unmodified_source)
+            self.assertIsNone(sprite.unmodified_source)
+            self.assertEqual(sprite["texture"], ExtResource(1))
+            self.assertIn("position = Vector2(1, 2)", str(scene))
+
+            scene = GDScene.parse(text, engine="fast", lazy=lazy)
+            scene.remove_sections([scene.get_ext_resources()[0]])
+            kept = str(scene)
+            scene.remove_unused_resources()
+            self.assertEqual(str(scene), kept)
+
     def test_addremove_sub_res(self):
         """Test adding and removing a sub_resource"""
         scene = GDResource()
@@ -197,6 +398,67 @@ class TestGDFile(unittest.TestCase):
         node = scene.find_node(parent=".")
         self.assertEqual(node, n2)
 
+    def test_index(self):
+        """Lookups stay correct as the sections and their attributes change"""
+        scene = GDScene()
+        res = scene.add_ext_resource("res://Other.tscn", "PackedScene")
+        scene.add_node("RootNode")
+        child = scene.add_node("Child", parent=".")
+        self.assertEqual(scene.find_ext_resource(id=1), res)
+        self.assertEqual(scene.find_ext_resource(path="res://Other.tscn"), res)
+        self.assertEqual(scene.find_node(name="Child", parent="."), child)
+        self.assertFalse(scene.is_inherited)
+
+        res.id = 5
+        child.name = "Renamed"
+        self.assertIsNone(scene.find_ext_resource(id=1))
+        self.assertIs(scene.find_ext_resource(id=5), res)
+        self.assertIsNone(scene.find_node(name="Child"))
+        self.assertIs(scene.find_node(name="Renamed"), child)
+        scene.find_node(parent=None).instance = 5
+        self.assertTrue(scene.is_inherited)
+        self.assertEqual(scene.get_parent_scene(), "res://Other.tscn")
+
+        # Sections can be removed while iterating over the results
+        for section in scene.find_all("node", parent="."):
+            scene.remove_section(section)
+        self.assertEqual(len(scene.get_nodes()), 1)
+        scene.add_sub_resource("Animation")
+        self.assertEqual(scene.find_sub_resource(id=1).type, "Animation")
+        self.assertEqual(scene.load_steps, 3)
+
+        scene.find_node(parent=None).instance = None
+        with scene.use_tree() as tree:
+            tree.root.add_child(Node("Sprite", type="Sprite"))
+        self.assertEqual(scene.find_node(name="Sprite").parent, ".")
+        self.assertEqual(scene.get_sections(), GDScene.parse(str(scene)).get_sections())
+        # The index isn't pickled with the file
+        self.assertIsNotNone(scene._index)
+        self.assertIsNone(pickle.loads(pickle.dumps(scene))._index)
+
+    def test_index_list_changes(self):
+        """Changes to the list from get_sections() are noticed by the index"""
+        scene = GDScene()
+        scene.add_node("Root")
+        scene.add_node("A", parent=".")
+        scene.add_node("C", parent=".")
+        sections = scene.get_sections()
+        self.assertIsNotNone(scene.find_node(name="A"))
+        sections[2] = GDNodeSection("B", parent=".")
+        self.assertIsNone(scene.find_node(name="A"))
+        self.assertIs(scene.find_node(name="B"), sections[2])
+        sections[2], sections[3] = sections[3], sections[2]
+        self.assertEqual([n.name for n in scene.get_nodes()], ["Root", "C", "B"])
+        sections.append(GDNodeSection("D", parent="."))
+        sections.pop(1)
+        self.assertIsNone(scene.find_node(name="Root"))
+        self.assertEqual(scene.find_node(name="D"), sections[-1])
+        self.assertEqual(scene.add_node("E", parent=".").name, "E")
+        self.assertEqual([n.name for n in scene.get_nodes()], ["C", "B", "D", "E"])
+        copied = pickle.loads(pickle.dumps(scene))
+        copied.get_sections().reverse()
+        self.assertEqual(copied.get_nodes()[0].name, "E")
+
     def test_file_equality(self):
         """Tests for GDFile == GDFile"""
         s1 = GDScene(GDResourceSection())
@@ -207,3 +469,98 @@ class TestGDFile(unittest.TestCase):
 
         resource["key"] = "value"
         self.assertNotEqual(s1, s2)
+
+    def test_streaming_write(self):
+        """Files can be written to streams one piece at a time"""
+        scene = GDScene.parse(
+            """[gd_scene load_steps=1 format=2]
+
+[node name="Root" type="Node2D"]
+position = Vector2( 1, 2 )
+text = "héllo"
+""",
+            engine="fast",
+        )
+        scene.add_node("Child", "Sprite", parent=".")
+        chunks = list(scene.iter_serialized())
+        self.assertGreater(len(chunks), 4)
+        self.assertEqual("".join(chunks), str(scene))
+
+        text = io.StringIO()
+        scene.dump(text)
+        self.assertEqual(text.getvalue(), str(scene))
+        data = io.BytesIO()
+        scene.dump(data)
+        self.assertEqual(data.getvalue(), str(scene).encode("utf-8"))
+        with tempfile.SpooledTemporaryFile(mode="w+", encoding="utf-8") as spooled:
+            scene.dump(spooled)
+            spooled.seek(0)
+            self.assertEqual(spooled.read(), str(scene))
+
+        class Writer(object):
+            def __init__(self):
+                self.chunks = []
+
+            def write(self, chunk):
+                self.chunks.append(chunk)
+
+        writer = Writer()
+        scene.dump(writer)
+        self.assertEqual("".join(writer.chunks), str(scene))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "Scene.tscn.gz")
+            with gzip.open(path, "wb") as ofile:
+                scene.dump(ofile)
+            with gzip.open(path, "rt", encoding="utf-8") as ifile:
+                self.assertEqual(ifile.read(), str(scene))
+
+    def test_write_if_changed(self):
+        """Files are only written when their contents change"""
+        scene = GDScene()
+        scene.add_node("Root", "Node2D")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "sub", "Scene.tscn")
+            self.assertTrue(scene.write(path, only_if_changed=True))
+            os.utime(path, (1, 1))
+            self.assertFalse(scene.write(path, only_if_changed=True))
+            self.assertEqual(os.stat(path).st_mtime, 1)
+            self.assertTrue(scene.write(path))
+
+            scene.add_node("Child", parent=".")
+            self.assertTrue(scene.write(path, only_if_changed=True))
+            with open(path, "r", encoding="utf-8") as ifile:
+                self.assertEqual(ifile.read(), str(scene))
+            # A longer file with the same beginning has changed too
+            with open(path, "a", encoding="utf-8") as ofile:
+                ofile.write("\n")
+            self.assertTrue(scene.write(path, only_if_changed=True))
+            self.assertFalse(scene.write(path, only_if_changed=True))
+
+            resource = GDResource()
+            resource.add_section(GDResourceSection(value=1))
+            path = os.path.join(tmpdir, "Resource.res")
+            self.assertTrue(resource.write(path, binary=True, only_if_changed=True))
+            self.assertFalse(resource.write(path, binary=True, only_if_changed=True))
+
+    def test_atomic_write(self):
+        """Atomic writes replace the file and keep its permissions"""
+        scene = GDScene()
+        scene.add_node("Root", "Node2D")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "Scene.tscn")
+            self.assertTrue(scene.write(path, atomic=True))
+            os.chmod(path, 0o640)
+            scene.add_node("Child", parent=".")
+            self.assertTrue(scene.write(path, atomic=True))
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o640)
+            self.assertEqual(os.listdir(tmpdir), ["Scene.tscn"])
+            self.assertEqual(GDScene.load(path), scene)
+
+            # A failed write leaves the old file in place
+            with mock.patch.object(
+                GDScene, "iter_serialized", side_effect=RuntimeError
+            ):
+                with self.assertRaises(RuntimeError):
+                    GDScene().write(path, atomic=True)
+            self.assertEqual(os.listdir(tmpdir), ["Scene.tscn"])
+            self.assertEqual(GDScene.load(path), scene)
@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+import unittest
+
+SCRIPT = """
+import sys
+import godot_parser
+from godot_parser import GDScene, Node
+
+GDScene()
+Node("Root", type="Node2D")
+print(",".join(sorted(m for m in %r if m in sys.modules)))
+"""
+
+LAZY_MODULES = (
+    "beartype",
+    "pyparsing",
+    "godot_parser.structure",
+    "godot_parser.values",
+    "godot_parser.binary",
+    "godot_parser.aio",
+    "asyncio",
+    "concurrent.futures",
+)
+
+
+class TestImport(unittest.TestCase):
+    """Tests for keeping the package import fast"""
+
+    def test_lazy_modules(self):
+        """Importing the package and building objects doesn't load the parsers"""
+        output = subprocess.check_output(
+            [sys.executable, "-c", SCRIPT % (LAZY_MODULES,)],
+            env=dict(os.environ, GODOT_PARSER_TYPECHECK=""),
+            text=True,
+        )
+        self.assertEqual(output.strip(), "")
+
+    def test_typecheck(self):
+        """GODOT_PARSER_TYPECHECK=1 checks the types of all arguments"""
+        script = "from godot_parser import ExtResource\nExtResource(1.5)"
+        for value, returncode in (("", 0), ("1", 1)):
+            process = subprocess.run(
+                [sys.executable, "-c", script],
+                env=dict(os.environ, GODOT_PARSER_TYPECHECK=value),
+                capture_output=True,
+                check=False,
+            )
+            self.assertEqual(process.returncode, returncode, process.stderr)
+
+    def test_lazy_names(self):
+        """Names from lazily imported modules are still available"""
+        import godot_parser  # pylint: disable=import-outside-toplevel
+
+        self.assertTrue(issubclass(godot_parser.GodotBinaryException, Exception))
+        self.assertTrue(callable(godot_parser.aload))
+        with self.assertRaises(AttributeError):
+            godot_parser.does_not_exist  # pylint: disable=pointless-statement
@@ -1,6 +1,20 @@
 import unittest
+from array import array
+from collections import OrderedDict
 
-from godot_parser import Color, ExtResource, NodePath, SubResource, Vector2, Vector3
+from godot_parser import (
+    Color,
+    ExtResource,
+    GDObject,
+    NodePath,
+    PackedInt32Array,
+    PackedVector2Array,
+    PoolRealArray,
+    SubResource,
+    Vector2,
+    Vector3,
+)
+from godot_parser.util import stringify_object
 
 
 class TestGDObjects(unittest.TestCase):
@@ -100,6 +114,23 @@ class TestGDObjects(unittest.TestCase):
         self.assertEqual(r.id, 2)
         self.assertEqual(str(r), "SubResource( 2 )")
 
+    def test_packed_array(self):
+        """Test for array-backed packed arrays"""
+        a = PackedVector2Array(1, 2, 3.5, 4)
+        self.assertEqual(a.values, array("d", [1, 2, 3.5, 4]))
+        self.assertEqual(len(a), 2)
+        self.assertEqual(list(a), [(1, 2), (3.5, 4)])
+        self.assertEqual(str(a), "PackedVector2Array( 1, 2, 3.5, 4 )")
+        self.assertEqual(a, GDObject("PackedVector2Array", 1, 2, 3.5, 4))
+        self.assertEqual(GDObject("PackedVector2Array", 1, 2, 3.5, 4), a)
+        self.assertNotEqual(a, PoolRealArray(1, 2, 3.5, 4))
+
+        i = PackedInt32Array.from_text("1, -2,3")
+        self.assertEqual(i.values, array("i", [1, -2, 3]))
+        self.assertEqual(list(i), [1, -2, 3])
+        self.assertEqual(str(i), "PackedInt32Array( 1, -2, 3 )")
+        self.assertEqual(len(PackedInt32Array.from_text("")), 0)
+
     def test_dunder(self):
         """Test the __magic__ methods on GDObject"""
         v = Vector2(1, 2)
@@ -109,3 +140,35 @@ class TestGDObjects(unittest.TestCase):
         v2.x = 10
         self.assertNotEqual(v, v2)
         self.assertNotEqual(v, (1, 2))
+
+    def test_stringify(self):
+        """Values serialize the same way through the dispatch table as with str()"""
+
+        class Name(str):
+            def __str__(self):
+                return "ignored"
+
+        class Custom(GDObject):
+            def __str__(self):
+                return "Custom(%s)" % super().__str__()
+
+        class Plain(Vector2):
+            pass
+
+        values = OrderedDict(a=[None, True, 1, 1.5], b={})
+        self.assertEqual(
+            stringify_object(values),
+            '{\n"a": [ null, true, 1, 1.5 ],\n"b": {\n\n}\n}',
+        )
+        self.assertEqual(stringify_object('a "b"\\ é\n'), '"a \\"b\\"\\\\ \\u00e9\\n"')
+        self.assertEqual(stringify_object(Name("x")), '"x"')
+        self.assertEqual(stringify_object([Custom("A", 1)]), "[ Custom(A( 1 )) ]")
+        self.assertEqual(stringify_object(Plain(1, 2.5)), "Vector2( 1, 2.5 )")
+        self.assertEqual(
+            stringify_object(GDObject("A", NodePath("a"), [], "s")),
+            'A( NodePath("a"), [  ], "s" )',
+        )
+        self.assertEqual(
+            stringify_object(PoolRealArray(1.0, -0.0, 0.05)),
+            "PoolRealArray( 1, -0, 0.05 )",
+        )
@@ -1,4 +1,6 @@
+import io
 import os
+import pathlib
 from typing import Optional
 import unittest
 
@@ -6,8 +8,20 @@ from pyparsing import ParseException
 
 from beartype.door import is_bearable
 
-from godot_parser import GDFile, GDObject, GDSection, GDSectionHeader, Vector2, parse
+from godot_parser import (
+    TYPECHECK,
+    GDFile,
+    GDObject,
+    GDSection,
+    GDSectionHeader,
+    PackedVector2Array,
+    PoolIntArray,
+    Vector2,
+    iter_sections,
+    parse,
+)
 from godot_parser.files import GDFileType
+from godot_parser.parser import GodotParseException
 from tests.snapshot_manager import SnapshotManager
 
 HERE = os.path.dirname(__file__)
@@ -160,3 +174,216 @@ class TestParser(unittest.TestCase):
                 content = f.read()
                 parsed = parse(content)
                 self.snapshot_manager.assert_match(str(parsed), f'{file}.parsed')
+
+    def test_fast_engine(self):
+        """The fast engine produces the same structures as pyparsing"""
+        for string, _ in TEST_CASES:
+            expected = parse(string)
+            result = parse(string, engine="fast")
+            self.assertEqual(type(result), type(expected))
+            self.assertEqual(result, expected)
+            for section in result.get_sections():
+                section.source = None
+            self.assertEqual(str(result), str(expected))
+
+    def test_fast_engine_example_data(self):
+        examples = os.path.join(HERE, "example_scenes")
+        for file in os.listdir(examples):
+            with open(os.path.join(examples, file), "r") as f:
+                contents = f.read()
+            parsed = parse(contents, engine="fast")
+            self.assertEqual(str(parsed), contents)
+            for section in parsed.get_sections():
+                section.source = None
+            self.snapshot_manager.assert_match(str(parsed), f"{file}.parsed")
+
+    def test_fast_engine_errors(self):
+        """The fast engine rejects the same invalid input as pyparsing"""
+        for string in [
+            "",
+            "[node]\nkey = 1 other = 2",
+            "[node]\nkey = [, 1]",
+            "[node]\nkey = Vector2(1, 2,)",
+            '[node]\nkey = "unterminated',
+        ]:
+            with self.assertRaises(ParseException):
+                parse(string)
+            with self.assertRaises(GodotParseException):
+                parse(string, engine="fast")
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            parse("[node]", engine="missing")
+
+    def test_iter_sections(self):
+        """iter_sections yields the same sections as parse"""
+        examples = os.path.join(HERE, "example_scenes")
+        for file in os.listdir(examples):
+            filepath = os.path.join(examples, file)
+            with open(filepath, "r") as f:
+                expected = parse(f.read()).get_sections()
+            self.assertEqual(list(iter_sections(filepath)), expected)
+
+    def test_iter_sections_sources(self):
+        """iter_sections reads paths, binary files and text streams"""
+        examples = os.path.join(HERE, "example_scenes")
+        filepath = os.path.join(examples, sorted(os.listdir(examples))[0])
+        with open(filepath, "r", encoding="utf-8") as f:
+            contents = f.read()
+        expected = parse(contents).get_sections()
+        self.assertEqual(list(iter_sections(pathlib.Path(filepath))), expected)
+        with open(filepath, "rb") as f:
+            self.assertEqual(list(iter_sections(f)), expected)
+            # The file is left open
+            self.assertFalse(f.closed)
+        stream = io.BytesIO(contents.encode("utf-8"))
+        self.assertEqual(list(iter_sections(stream)), expected)
+        self.assertFalse(stream.closed)
+        if not TYPECHECK:
+            # With GODOT_PARSER_TYPECHECK=1, beartype rejects it first
+            with self.assertRaises(TypeError):
+                list(iter_sections(42))  # type: ignore[arg-type]
+
+    def test_iter_sections_boundaries(self):
+        """Brackets inside strings and values do not start a new section"""
+        contents = (
+            '[node name="A"]\nkey = "multi\n[line]\n"\nlist = [\n[ 1 ]\n]\n[node]\n'
+        )
+        sections = list(iter_sections(io.StringIO(contents)))
+        self.assertEqual(sections, parse(contents).get_sections())
+        self.assertEqual(len(sections), 2)
+
+    def test_iter_sections_error(self):
+        """Errors report the position in the whole file"""
+        contents = "[node]\nkey = 1\n\n[node]\nkey = 1 2\n"
+        with self.assertRaises(GodotParseException) as cm:
+            list(iter_sections(io.StringIO(contents)))
+        self.assertEqual(cm.exception.lineno, 5)
+        self.assertEqual(cm.exception.col, 9)
+
+    def test_lazy(self):
+        """Lazy parsing decodes on access and writes untouched values verbatim"""
+        contents = '[node name="A"]\nposition = Vector2(1, 2)\nscale = Vector2(3, 4)\n'
+        scene = parse(contents, lazy=True)
+        self.assertEqual(str(scene), contents)
+        node = scene.find_section("node")
+        assert node is not None
+        node["scale"] = Vector2(5, 6)
+        self.assertEqual(
+            str(scene),
+            '[node name="A"]\nposition = Vector2(1, 2)\nscale = Vector2( 5, 6 )\n',
+        )
+        self.assertEqual(node["position"], Vector2(1, 2))
+        self.assertEqual(
+            list(iter_sections(io.StringIO(contents), lazy=True)),
+            [parse(contents)._sections[0]],
+        )
+
+    def test_packed_arrays(self):
+        """Packed arrays of numbers are converted in one pass"""
+        contents = """[resource]
+points = PackedVector2Array(0, 0.5, -1, 1e3)
+ints = PoolIntArray( 1, 2,
+ 3 )
+"""
+        expected = parse(contents).get_sections()[0]
+        section = parse(contents, engine="fast").get_sections()[0]
+        self.assertEqual(section, expected)
+        self.assertIsInstance(section["points"], PackedVector2Array)
+        self.assertEqual(list(section["points"]), [(0, 0.5), (-1, 1000)])
+        self.assertIsInstance(section["ints"], PoolIntArray)
+        self.assertEqual(list(section["ints"]), [1, 2, 3])
+
+        scene = parse("[resource]\nempty = PackedVector2Array()", engine="fast")
+        self.assertEqual(len(scene.get_sections()[0]["empty"]), 0)
+
+    def test_packed_arrays_fallback(self):
+        """Packed arrays that aren't numbers that fit are kept as generic objects"""
+        contents = """[resource]
+bytes = PackedByteArray( "AAECAw==" )
+big = PoolIntArray( 1, 99999999999 )
+floats = PackedInt32Array( 1.5 )
+"""
+        for engine in ("pyparsing", "fast"):
+            section = parse(contents, engine=engine).get_sections()[0]
+            for key in ("bytes", "big", "floats"):
+                self.assertIs(type(section[key]), GDObject)
+            self.assertEqual(section["bytes"].args, ["AAECAw=="])
+            self.assertEqual(section["big"].args, [1, 99999999999])
+            self.assertEqual(section["floats"].args, [1.5])
+            self.assertEqual(str(parse(str(parse(contents)))), str(parse(contents)))
+        with self.assertRaises(ParseException):
+            parse("[resource]\nempty = PackedByteArray(  )")
+
+    def test_reparse(self):
+        """Incremental re-parsing only re-parses the sections that were edited"""
+        contents = """[gd_scene load_steps=1 format=2]
+
+[node name="Root" type="Node2D"]
+position = Vector2( 1, 2 )
+
+[node name="Child" type="Node2D" parent="."]
+"""
+        scene = parse(contents, engine="fast")
+        root, child = scene.get_sections()[1:]
+
+        # Edit a property value
+        offset = contents.index("2 )")
+        edited = scene.reparse(contents, offset, 1, "5")
+        new_contents = contents[:offset] + "5" + contents[offset + 1 :]
+        self.assertEqual(edited, parse(new_contents))
+        self.assertIs(edited.get_sections()[0], scene.get_sections()[0])
+        self.assertIsNot(edited.get_sections()[1], root)
+        self.assertIs(edited.get_sections()[2], child)
+
+        # Insert a new section
+        offset = contents.index('[node name="Child"')
+        inserted = '[node name="New" type="Node" parent="."]\n\n'
+        edited = scene.reparse(contents, offset, 0, inserted)
+        new_contents = contents[:offset] + inserted + contents[offset:]
+        self.assertEqual(edited, parse(new_contents))
+        self.assertEqual(len(edited.get_sections()), 4)
+
+        # Invalid edits report the error in the new text
+        with self.assertRaises(GodotParseException):
+            scene.reparse(contents, contents.index("Vector2"), 0, "(")
+
+        # Sections that weren't parsed from this text cause a full parse
+        scene = parse(contents)
+        self.assertEqual(scene.reparse(contents, 0, 0, "\n"), parse(contents))
+
+    def test_passthrough(self):
+        """Sections that haven't changed are written out exactly as they were parsed"""
+        contents = """[gd_scene load_steps=2 format=2]
+
+[ext_resource path="res://Player.gd" type="Script" id=1]
+
+[node name="Root" type="Node2D"]
+position = Vector2(1,2)
+tags = [ 1,2 ]
+
+[node name="Child" type="Sprite" parent="."]
+script = ExtResource(1)
+"""
+        for lazy in (False, True):
+            scene = parse(contents, engine="fast", lazy=lazy)
+            self.assertEqual(str(scene), contents)
+
+            # Reading immutable values doesn't count as a change
+            root, child = scene.get_sections("node")
+            self.assertEqual(root.name, "Root")
+            self.assertEqual(str(scene), contents)
+
+            # Values that could be changed in place do
+            child["script"].id = 2
+            self.assertEqual(
+                str(scene),
+                contents.replace(
+                    "script = ExtResource(1)", "script = ExtResource( 2 )"
+                ),
+            )
+            self.assertEqual(str(root), contents.split("\n\n")[2])
+            root.header["name"] = "Root2"
+            self.assertEqual(
+                str(root).split("\n")[0], '[node name="Root2" type="Node2D"]'
+            )
@@ -0,0 +1,134 @@
+import pickle
+import unittest
+
+from godot_parser import GDScene, Query, Vector2
+from godot_parser.sections import index_generation
+
+
+def make_scene():
+    scene = GDScene()
+    scene.add_node("Root", type="Node2D")
+    for i in range(6):
+        node = scene.add_node(
+            "Area%d" % i,
+            type="Area3D" if i % 2 else "Area2D",
+            parent=".",
+            groups=["enemies"] if i < 2 else None,
+        )
+        node["collision_layer"] = i
+        node["position"] = Vector2(i, 0)
+    scene.add_node("Sprite", type="Sprite", parent="Area0")
+    return scene
+
+
+def names(query):
+    return [section.name for section in query]
+
+
+class TestQuery(unittest.TestCase):
+    """Tests for Query"""
+
+    def test_lookups(self):
+        """Lookups match fields with operators"""
+        scene = make_scene()
+        nodes = scene.query("node")
+        self.assertIsInstance(nodes, Query)
+        self.assertEqual(names(nodes.where(type="Area3D")), ["Area1", "Area3", "Area5"])
+        self.assertEqual(
+            names(nodes.where(type__in={"Sprite", "Node2D"})), ["Root", "Sprite"]
+        )
+        self.assertEqual(names(nodes.where(name__glob="Area[45]")), ["Area4", "Area5"])
+        self.assertEqual(
+            names(nodes.where(props__collision_layer__range=(2, 3))), ["Area2", "Area3"]
+        )
+        self.assertEqual(names(nodes.where(props__collision_layer__gte=5)), ["Area5"])
+        self.assertEqual(names(nodes.where(props__position__x__lt=1)), ["Area0"])
+        self.assertEqual(
+            names(nodes.where(groups__contains="enemies")), ["Area0", "Area1"]
+        )
+        self.assertEqual(
+            names(nodes.where(props__collision_layer__isnull=True)), ["Root", "Sprite"]
+        )
+        self.assertEqual(names(nodes.where(parent__ne=".")), ["Root", "Sprite"])
+        self.assertEqual(
+            names(nodes.where(lambda s: s.name.endswith("2"), type="Area2D")),
+            ["Area2"],
+        )
+        # where() returns a new query
+        areas = nodes.where(type__glob="Area*")
+        self.assertEqual(areas.count(), 6)
+        self.assertEqual(areas.where(props__collision_layer=4).first().name, "Area4")
+        self.assertIsNone(areas.where(name="Root").first())
+        self.assertEqual(len(scene.query().all()), len(scene.get_sections()))
+
+    def test_index(self):
+        """Queries use and maintain the indexes added with add_index"""
+        scene = make_scene()
+        scene.add_index("node", "type")
+        scene.add_index("node", "props__collision_layer")
+        query = scene.query("node").where(type="Area3D", props__collision_layer=3)
+        self.assertEqual(len(query._candidates()), 1)
+        self.assertEqual(names(query), ["Area3"])
+        in_query = scene.query("node").where(type__in=["Sprite", "Node2D"])
+        self.assertEqual(len(in_query._candidates()), 2)
+
+        scene.find_node(name="Area3")["collision_layer"] = 7
+        scene.find_node(name="Area1")["collision_layer"] = 3
+        self.assertEqual(names(query), ["Area1"])
+        scene.find_node(name="Sprite").type = "Area3D"
+        self.assertEqual(names(in_query), ["Root"])
+        node = scene.add_node("New", type="Area3D", parent=".")
+        node["collision_layer"] = 3
+        self.assertEqual(names(query), ["Area1", "New"])
+        scene.remove_section(node)
+        self.assertEqual(names(query), ["Area1"])
+        with scene.use_tree() as tree:
+            tree.get_node("Area5")["collision_layer"] = 3
+        self.assertEqual(names(query), ["Area1", "Area5"])
+        # Indexes are kept when pickling
+        copied = pickle.loads(pickle.dumps(scene))
+        self.assertEqual(copied._index_fields, scene._index_fields)
+        copied_query = copied.query("node").where(
+            type="Area3D", props__collision_layer=3
+        )
+        self.assertEqual(names(copied_query), ["Area1", "Area5"])
+
+    def test_update(self):
+        """update() sets fields on all of the matches"""
+        scene = make_scene()
+        areas = scene.query("node").where(type="Area2D")
+        self.assertEqual(areas.update(props__monitoring=False, index=1), 3)
+        for node in areas:
+            self.assertEqual(node["monitoring"], False)
+            self.assertEqual(node.index, 1)
+        areas.update(props__position=Vector2(9, 9), type=None)
+        nodes = [scene.find_node(name=name) for name in ("Area0", "Area2")]
+        self.assertEqual(nodes[0]["position"], nodes[1]["position"])
+        self.assertIsNot(nodes[0]["position"], nodes[1]["position"])
+        self.assertIsNone(nodes[0].type)
+        with self.assertRaises(ValueError):
+            areas.update(props__position__x=1)
+
+    def test_index_fields_per_file(self):
+        """Indexed fields only affect the file that added them"""
+        scene = make_scene()
+        scene.add_index("node", "props__collision_layer")
+        scene.add_index("node", "props__position__x")
+        query = scene.query("node").where(props__collision_layer=3)
+        self.assertEqual(names(query), ["Area3"])
+        other = make_scene()
+        names(other.query("node").where(name="Root"))
+        generation = index_generation()
+        other.find_node(name="Area3").properties["collision_layer"] = 9
+        other.find_node(name="Area2").name = "Area2"
+        self.assertEqual(index_generation(), generation)
+        self.assertEqual(names(query), ["Area3"])
+
+        # Values inside a property are indexed again when the property is set
+        by_x = scene.query("node").where(props__position__x=9)
+        node = scene.find_node(name="Area4")
+        position = node["position"]
+        self.assertEqual(names(by_x), [])
+        position.x = 9
+        node["position"] = position
+        self.assertEqual(names(by_x), ["Area4"])
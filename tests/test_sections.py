@@ -6,7 +6,9 @@ from godot_parser import (
     GDSection,
     GDSectionHeader,
     GDSubResourceSection,
+    Vector2,
 )
+from godot_parser.sections import LazyProperties, RawValue
 
 
 class TestGDSections(unittest.TestCase):
@@ -91,3 +93,93 @@ class TestGDSections(unittest.TestCase):
         # Setting groups
         s.groups = ["baz"]
         self.assertEqual(s.groups, ["baz"])
+
+    def test_lazy_properties(self):
+        """LazyProperties decodes values on access and keeps untouched text"""
+        s = GDSection(GDSectionHeader("node"))
+        s.properties = LazyProperties(
+            [("position", "Vector2(1, 2)"), ("scale", "Vector2(3, 4)")]
+        )
+        self.assertIsInstance(s.properties.raw_items().mapping["scale"], RawValue)
+        self.assertEqual(s["position"], Vector2(1, 2))
+        self.assertEqual(s.get("missing"), None)
+        s["scale"] = Vector2(5, 6)
+        self.assertEqual(
+            str(s), "[node]\nposition = Vector2( 1, 2 )\nscale = Vector2( 5, 6 )"
+        )
+        del s["scale"]
+        self.assertEqual(list(s.properties), ["position"])
+        self.assertEqual(s, GDSection(GDSectionHeader("node"), position=Vector2(1, 2)))
+
+    def test_lazy_properties_equality(self):
+        """Comparing sections doesn't count as a change to their lazy properties"""
+        sections = []
+        for _ in range(2):
+            s = GDSection(GDSectionHeader("node"))
+            s.properties = LazyProperties([("position", "Vector2(1, 2)"), ("z", "1")])
+            sections.append(s)
+        a, b = sections
+        self.assertEqual(a, b)
+        self.assertEqual(
+            a, GDSection(GDSectionHeader("node"), position=Vector2(1, 2), z=1)
+        )
+        self.assertNotEqual(
+            a, GDSection(GDSectionHeader("node"), z=1, position=Vector2(1, 2))
+        )
+        self.assertFalse(a._properties._touched)
+        self.assertFalse(b._properties._touched)
+        self.assertFalse(a._properties._shared)
+
+    def test_cached_text(self):
+        """Sections are only rendered again after they change"""
+        s = GDNodeSection("Sprite", type="Sprite", parent=".")
+        s["position"] = Vector2(1, 2)
+        text = str(s)
+        self.assertEqual(s._rendered, text)
+        self.assertEqual(str(s), text)
+        # Setting a header attribute to the same value isn't a change
+        s.name = "Sprite"
+        self.assertEqual(s._rendered, text)
+        s.name = "Other"
+        self.assertIsNone(s._cached_text())
+        str(s)
+        # Values that can be modified in place count as a change when read
+        s["position"].x = 3
+        self.assertIn("Vector2( 3, 2 )", str(s))
+        del s.header["missing"]
+        self.assertIsNotNone(s._rendered)
+        del s["position"]
+        self.assertEqual(str(s), '[node name="Other" type="Sprite" parent="."]')
+
+    def test_cached_text_shared_values(self):
+        """Values changed in place after they were read are still written out"""
+        s = GDNodeSection("Sprite", type="Sprite")
+        s["position"] = Vector2(1, 2)
+        s["tags"] = [1]
+        pos = s["position"]
+        tags = s["tags"]
+        str(s)
+        pos.x = 50
+        tags.append(2)
+        text = str(s)
+        self.assertIn("position = Vector2( 50, 2 )", text)
+        self.assertIn("tags = [ 1, 2 ]", text)
+
+        s = GDSection(GDSectionHeader("resource"), size=3)
+        properties = s.properties
+        str(s)
+        properties["size"] = 4
+        self.assertEqual(str(s), "[resource]\nsize = 4")
+
+        s = GDSection(GDSectionHeader("resource"))
+        s.properties = LazyProperties([("position", "Vector2(1, 2)")])
+        pos = s.properties["position"]
+        str(s)
+        pos.y = 5
+        self.assertEqual(str(s), "[resource]\nposition = Vector2( 1, 5 )")
+        # Sections with only immutable values keep their text
+        s = GDNodeSection("Sprite", type="Sprite")
+        s["visible"] = False
+        text = str(s)
+        self.assertIs(s._cached_text(), s._rendered)
+        self.assertEqual(str(s), text)
@@ -2,8 +2,9 @@ import os
 import shutil
 import tempfile
 import unittest
+from unittest import mock
 
-from godot_parser import GDScene, Node, SubResource, TreeMutationException
+from godot_parser import GDFile, GDScene, Node, SubResource, TreeMutationException
 from godot_parser.sections import GDNodeSection
 from godot_parser.util import find_project_root, gdpath_to_filepath
 
@@ -313,6 +314,132 @@ flip_h = true
         node = scene.find_section("node", name="Sprite")
         self.assertIsNone(node)
 
+    def test_parent_scene_cache(self):
+        """Parent scenes are only parsed once while they are unchanged"""
+        assert self.leaf_scene is not None
+        leaf = GDScene.load(self.leaf_scene)
+        with leaf.use_tree():
+            pass
+        mid = leaf.load_parent_scene()
+        with mock.patch.object(GDFile, "parse", side_effect=AssertionError):
+            for _ in range(2):
+                with leaf.use_tree() as tree:
+                    sprite = tree.get_node("Sprite")
+                    assert sprite is not None
+                    sprite["flip_v"] = True
+                    health = tree.get_node("Health")
+                    assert health is not None
+                    health["pause_mode"] = 1
+            mid = leaf.load_parent_scene()
+        # The shared parent trees were not modified
+        with GDScene.load(self.leaf_scene).use_tree() as tree:
+            health = tree.get_node("Health")
+            assert health is not None
+            self.assertEqual(health["pause_mode"], 2)
+            sprite = tree.get_node("Sprite")
+            assert sprite is not None
+            self.assertIsNone(sprite.get("flip_v"))
+        # The copies returned by load_parent_scene are not shared
+        mid.get_nodes()[0]["collision_layer"] = 5
+        parent_root = leaf.load_parent_scene().get_nodes()[0]
+        self.assertEqual(parent_root["collision_layer"], 4)
+
+    def test_parent_scene_cache_mutable_values(self):
+        """Changing inherited values in place doesn't change other scenes"""
+        assert self.project_dir is not None
+        project = tempfile.mkdtemp(dir=self.project_dir)
+        shutil.copy(os.path.join(self.project_dir, "project.godot"), project)
+        GDScene.parse(
+            """[gd_scene load_steps=1 format=2]
+
+[node name="Root" type="Node2D"]
+tags = [ 1, 2 ]
+
+[node name="Child" type="Sprite" parent="."]
+offset = Vector2( 3, 4 )
+"""
+        ).write(os.path.join(project, "Parent.tscn"))
+        child_scene = """[gd_scene load_steps=2 format=2]
+
+[ext_resource path="res://Parent.tscn" type="PackedScene" id=1]
+
+[node name="Scene" instance=ExtResource( 1 )]
+"""
+        for name in ("A.tscn", "B.tscn"):
+            GDScene.parse(child_scene).write(os.path.join(project, name))
+        scene_a = GDScene.load(os.path.join(project, "A.tscn"))
+        with scene_a.use_tree() as tree:
+            child = tree.get_node("Child")
+            assert child is not None and tree.root is not None
+            child["offset"].x = 99
+            tree.root["tags"].append(3)
+            self.assertEqual(child["offset"].x, 99)
+        self.assertEqual(str(scene_a), child_scene)
+        scene_b = GDScene.load(os.path.join(project, "B.tscn"))
+        with scene_b.use_tree() as tree:
+            child = tree.get_node("Child")
+            assert child is not None and tree.root is not None
+            self.assertEqual(str(child["offset"]), "Vector2( 3, 4 )")
+            self.assertEqual(tree.root.get("tags"), [1, 2])
+
+    def test_parent_scene_cache_invalidation(self):
+        """Changing any scene in the chain of parents reloads it"""
+        assert self.project_dir is not None
+        project = tempfile.mkdtemp(dir=self.project_dir)
+        for name in ("project.godot", "Root.tscn", "Mid.tscn", "Leaf.tscn"):
+            shutil.copy(os.path.join(self.project_dir, name), project)
+        leaf = GDScene.load(os.path.join(project, "Leaf.tscn"))
+        with leaf.use_tree() as tree:
+            health = tree.get_node("Health")
+            assert health is not None
+            self.assertIsNone(health.get("mouse_filter"))
+        root = GDScene.load(os.path.join(project, "Root.tscn"))
+        node = root.find_node(name="Health")
+        assert node is not None
+        node["mouse_filter"] = 2
+        root.write(os.path.join(project, "Root.tscn"))
+        with leaf.use_tree() as tree:
+            health = tree.get_node("Health")
+            assert health is not None
+            self.assertEqual(health.get("mouse_filter"), 2)
+
+    def test_use_tree_cached_text(self):
+        """Nodes that use_tree() doesn't change keep their text and groups"""
+        scene = GDScene()
+        scene.add_node("RootNode")
+        scene.add_node("Child", parent=".", groups=["enemies"])
+        scene.add_node("Other", parent=".")
+        str(scene)
+        with scene.use_tree() as tree:
+            tree.get_node("Other")["visible"] = False
+        child = scene.find_section("node", name="Child")
+        self.assertEqual(child.groups, ["enemies"])
+        self.assertIsNotNone(child._rendered)
+        self.assertIsNone(scene.find_section("node", name="Other")._rendered)
+        self.assertIn("visible = false", str(scene))
+
+    def test_edit_after_use_tree(self):
+        """Values read from a node and changed after use_tree() are written out"""
+        text = """[gd_scene load_steps=1 format=2]
+
+[node name="Root" type="Node2D"]
+position = Vector2(1, 2)
+
+[node name="Child" type="Node2D" parent="."]
+position = Vector2(3, 4)
+"""
+        for engine in ("pyparsing", "fast"):
+            scene = GDScene.parse(text, engine=engine)
+            str(scene)
+            with scene.use_tree() as tree:
+                root = tree.root
+            root["position"].x = 99
+            output = str(scene)
+            self.assertIn("position = Vector2( 99, 2 )", output)
+            if engine == "fast":
+                # The node that wasn't read keeps its source
+                self.assertIn("position = Vector2(3, 4)", output)
+
     def test_find_project_root(self):
         """Can find project root even if deep in folder"""
         assert self.project_dir is not None